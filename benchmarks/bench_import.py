@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+
+# Start-up cost of every subcommand: each one runs openshift_pod_summarizer.py
+# on a small synthetic dump (see gen_dump.py) under `python -X importtime` in
+# a fresh process, and reports the wall time, the total import time and the
+# heaviest top-level imports.
+#
+#   python3 benchmarks/bench_import.py
+#   python3 benchmarks/bench_import.py --top 10 --subcommands help summarize-csv
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import gen_dump
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TOP_DIR = os.path.join(BENCH_DIR, '..')
+SUMMARIZER = os.path.join(TOP_DIR, 'openshift_pod_summarizer.py')
+
+# name -> summarizer arguments, {dump}, {out} and {db} are filled in
+SUBCOMMANDS = {
+    'help': ['--help'],
+    'summarize-csv': ['summarize', '--offline', '{dump}', '--format', 'csv', '--output', '{out}.csv'],
+    'summarize-jsonl': ['summarize', '--offline', '{dump}', '--format', 'jsonl', '--output', '{out}.jsonl'],
+    'summarize-xlsx': ['summarize', '--offline', '{dump}', '--output', '{out}.xlsx'],
+    'watch': ['watch', '--offline', '{dump}', '--watch-events', os.devnull, '--format', 'csv', '--output', '{out}.csv'],
+    'batch': ['batch', '{dump}', '--format', 'csv', '--output-dir', '{out}', '--jobs', '1'],
+    'diff': ['diff', '{dump}', '{dump}', '--format', 'jsonl', '--output', '{out}.jsonl', '--jobs', '1'],
+    'summarize-sqlite': ['summarize', '--offline', '{dump}', '--format', 'sqlite', '--output', '{db}'],
+    'query': ['query', '{db}', 'privileged'],
+}
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package", nested
+    # imports are indented, so the top-level ones add up to the total
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.startswith('  '):
+            continue
+        modules.append((int(cumulative_us), name.strip()))
+    return modules
+
+def run_subcommand(args):
+    cmd = [sys.executable, '-X', 'importtime', SUMMARIZER] + args + ['--quiet'] * (args != ['--help'])
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=TOP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        print('* `{}` failed with {}'.format(' '.join(cmd), proc.returncode))
+        print(proc.stderr[-2000:])
+        sys.exit(1)
+    return elapsed, parse_importtime(proc.stderr)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subcommands', nargs='+', choices=list(SUBCOMMANDS), default=list(SUBCOMMANDS))
+    parser.add_argument('--top', type=int, default=5, help='number of heaviest imports listed per subcommand')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per subcommand, the fastest is reported')
+    parser.add_argument('--pods', type=int, default=100)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ops-bench-import-')
+    try:
+        dump_args = gen_dump.fill_defaults(argparse.Namespace(pods=args.pods, replicasets=None, jobs=None, daemonsets=2,
+            static_pods=len(gen_dump.STATIC_POD_NAMESPACES), containers_per_pod=2, nodes=5, namespaces=10, seed=0))
+        dump = os.path.join(workdir, 'synthetic.json')
+        gen_dump.write_dump(dump_args, dump)
+
+        print('{:<16} {:>8} {:>10}  {}'.format('subcommand', 'sec', 'import ms', 'heaviest imports (ms)'))
+        for name in args.subcommands:
+            out = os.path.join(workdir, name)
+            db = os.path.join(workdir, 'summary.sqlite')
+            if name == 'query' and not os.path.exists(db):
+                run_subcommand([arg.format(dump=dump, db=db) for arg in SUBCOMMANDS['summarize-sqlite']])
+            cmd_args = [arg.format(dump=dump, out=out, db=db) for arg in SUBCOMMANDS[name]]
+            elapsed, modules = min((run_subcommand(cmd_args) for i in range(args.repeat)), key=lambda x: x[0])
+            total_ms = sum(us for us, module in modules) / 1000
+            heaviest = ', '.join('{} {:.1f}'.format(module, us / 1000) for us, module in sorted(modules, reverse=True)[:args.top])
+            print('{:<16} {:>8.3f} {:>10.1f}  {}'.format(name, elapsed, total_ms, heaviest))
+    finally:
+        shutil.rmtree(workdir)
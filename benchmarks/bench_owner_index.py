@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+# Owner resolution benchmark: time per pod should stay flat as the number of
+# ReplicaSets grows, i.e. the whole run stays linear.
+#
+#   python3 benchmarks/bench_owner_index.py [--scales 1000 5000 20000]
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import openshift_pod_summarizer as ops
+
+def make_dataset(num_rs, pods_per_rs):
+    data = {'Pod': [], 'ReplicaSet': [], 'Deployment': []}
+    for i in range(num_rs):
+        ns = 'ns-{}'.format(i % 50)
+        deploy = 'app{}'.format(i)
+        rs = '{}-{:010d}'.format(deploy, i)
+        data['Deployment'].append({
+            'kind': 'Deployment',
+            'metadata': {'namespace': ns, 'name': deploy},
+            'spec': {'replicas': pods_per_rs},
+        })
+        data['ReplicaSet'].append({
+            'kind': 'ReplicaSet',
+            'metadata': {'namespace': ns, 'name': rs, 'ownerReferences': [{'kind': 'Deployment', 'name': deploy}]},
+            'spec': {'replicas': pods_per_rs},
+        })
+        for j in range(pods_per_rs):
+            data['Pod'].append({
+                'kind': 'Pod',
+                'metadata': {'namespace': ns, 'name': '{}-{:05d}'.format(rs, j), 'ownerReferences': [{'kind': 'ReplicaSet', 'name': rs}]},
+                'spec': {'nodeName': 'node{}'.format(j)},
+            })
+    return data
+
+def run(num_rs, pods_per_rs):
+    data = make_dataset(num_rs, pods_per_rs)
+    start = time.perf_counter()
+    index = ops.build_resource_index(data)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for pod in data['Pod']:
+            md = pod['metadata']
+            ref = md['ownerReferences'][0]
+            ops.normalize_owner_kind(index, ref['kind'], ref['name'], md['namespace'])
+            ops.get_number_of_pods(index, '', ref['kind'], ref['name'], md['name'], md['namespace'])
+    return len(data['Pod']), time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', nargs='+', type=int, default=[1000, 5000, 20000, 50000])
+    parser.add_argument('--pods-per-rs', type=int, default=2)
+    args = parser.parse_args()
+
+    print('{:>10} {:>10} {:>10} {:>12}'.format('replicasets', 'pods', 'sec', 'usec/pod'))
+    for num_rs in args.scales:
+        npods, elapsed = run(num_rs, args.pods_per_rs)
+        print('{:>10} {:>10} {:>10.3f} {:>12.2f}'.format(num_rs, npods, elapsed, elapsed / npods * 1e6))
@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+# Full pipeline benchmark on synthetic dumps (see gen_dump.py). Every scale
+# runs openshift_pod_summarizer.py in a fresh process and reports wall time,
+# throughput and peak RSS. Baselines are machine specific, save them on the
+# machine that runs the comparison:
+#
+#   python3 benchmarks/bench_pipeline.py --scales 1000 10000 --save-baseline
+#   python3 benchmarks/bench_pipeline.py --scales 1000 10000   # exit 1 on regression
+
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import gen_dump
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TOP_DIR = os.path.join(BENCH_DIR, '..')
+SUMMARIZER = os.path.join(TOP_DIR, 'openshift_pod_summarizer.py')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines.json')
+
+def run_pipeline(dump, output, summarizer_args):
+    cmd = [sys.executable, SUMMARIZER, '--offline', dump, '--output', output, '--quiet'] + summarizer_args
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=TOP_DIR)
+    # wait4() gives the rusage of this child only
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        print('* `{}` failed with {}'.format(' '.join(cmd), proc.returncode))
+        sys.exit(1)
+    # ru_maxrss is in KiB on linux
+    return elapsed, rusage.ru_maxrss / 1024
+
+def bench_key(args, pods):
+    return '{} {}:{}'.format(args.dump_format, ' '.join(args.summarizer_args), pods)
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    for field in ('sec', 'max_rss_mb'):
+        if result[field] > baseline[field] * (1 + tolerance):
+            regressions.append('{} {:.2f} > {:.2f} (+{:.0f}%)'.format(field, result[field], baseline[field], (result[field] / baseline[field] - 1) * 100))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', nargs='+', type=int, default=[1000, 5000, 20000], help='number of pods')
+    parser.add_argument('--dump-format', choices=['json', 'yaml'], default='json')
+    parser.add_argument('--summarizer-args', type=shlex.split, default=[], help='extra summarizer arguments, e.g. "--format csv" or =--write-only')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown / growth over the baseline')
+    parser.add_argument('--keep-dumps', help='directory to keep the generated dumps in')
+    gen_dump.add_arguments(parser)
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    workdir = args.keep_dumps or tempfile.mkdtemp(prefix='ops-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    results = {}
+    failed = False
+    print('{:>8} {:>8} {:>10} {:>10} {:>10}  {}'.format('pods', 'MB', 'sec', 'pods/sec', 'maxrss MB', 'vs baseline'))
+    for pods in args.scales:
+        args.pods = pods
+        args.replicasets = None
+        args.jobs = None
+        gen_dump.fill_defaults(args)
+        dump = os.path.join(workdir, 'synthetic-{}.{}'.format(pods, args.dump_format))
+        if not os.path.exists(dump):
+            gen_dump.write_dump(args, dump)
+        output = os.path.join(workdir, 'result-{}'.format(pods))
+
+        elapsed, max_rss_mb = run_pipeline(dump, output, args.summarizer_args)
+        key = bench_key(args, pods)
+        result = {'sec': elapsed, 'pods_per_sec': pods / elapsed, 'max_rss_mb': max_rss_mb}
+        results[key] = result
+
+        note = ''
+        if key in baselines and not args.save_baseline:
+            regressions = compare(result, baselines[key], args.tolerance)
+            note = 'REGRESSION: ' + ', '.join(regressions) if regressions else 'ok'
+            failed = failed or bool(regressions)
+        print('{:>8} {:>8.1f} {:>10.2f} {:>10.0f} {:>10.1f}  {}'.format(pods, os.path.getsize(dump) / 1024 / 1024, elapsed, result['pods_per_sec'], max_rss_mb, note))
+
+    if not args.keep_dumps:
+        shutil.rmtree(workdir)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('* baseline saved to {}'.format(args.baseline))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+
+# Synthetic `kubectl get -A pod,replicaset,... -o json|yaml` dumps with the
+# object shapes openshift_pod_summarizer.py reads, at a configurable scale.
+#
+#   python3 benchmarks/gen_dump.py --pods 50000 --output /tmp/dump.json
+
+import sys
+import json
+import hashlib
+import yaml
+import random
+import argparse
+
+try:
+    from yaml import CDumper as YamlDumper
+except ImportError:
+    from yaml import Dumper as YamlDumper
+
+class NoAliasDumper(YamlDumper):
+    # kubectl never writes anchors, shared fragments are written out in full
+    def ignore_aliases(self, data):
+        return True
+
+STATIC_POD_NAMESPACES = [
+    ('openshift-etcd', 'etcd'),
+    ('openshift-kube-apiserver', 'kube-apiserver'),
+    ('openshift-kube-controller-manager', 'kube-controller-manager'),
+    ('openshift-kube-scheduler', 'openshift-kube-scheduler'),
+]
+
+TOLERATIONS = [
+    [{'effect': 'NoExecute', 'key': 'node.kubernetes.io/not-ready', 'operator': 'Exists', 'tolerationSeconds': 300},
+     {'effect': 'NoExecute', 'key': 'node.kubernetes.io/unreachable', 'operator': 'Exists', 'tolerationSeconds': 300}],
+    [{'effect': 'NoSchedule', 'key': 'node-role.kubernetes.io/master', 'operator': 'Exists'}],
+    [{'operator': 'Exists'}],
+]
+SECURITY_CONTEXTS = [
+    {},
+    {'runAsNonRoot': True, 'seccompProfile': {'type': 'RuntimeDefault'}},
+    {'fsGroup': 1000, 'runAsUser': 1000, 'seLinuxOptions': {'level': 's0:c26,c5'}},
+]
+CONTAINER_SECURITY_CONTEXTS = [
+    {'allowPrivilegeEscalation': False, 'capabilities': {'drop': ['ALL']}, 'readOnlyRootFilesystem': True},
+    {'privileged': True},
+    {},
+]
+NODE_SELECTORS = [
+    {'kubernetes.io/os': 'linux'},
+    {'node-role.kubernetes.io/master': ''},
+    {'node-role.kubernetes.io/worker': ''},
+]
+
+def random_suffix(rnd, n, chars='bcdfghjklmnpqrstvwxz2456789'):
+    return ''.join(rnd.choice(chars) for _ in range(n))
+
+def metadata(name, ns, owner_kind=None, owner_name=None):
+    md = {'name': name, 'namespace': ns, 'resourceVersion': '1', 'uid': '00000000-0000-0000-0000-000000000000'}
+    if owner_kind:
+        md['ownerReferences'] = [{'apiVersion': 'v1', 'kind': owner_kind, 'name': owner_name, 'controller': True, 'blockOwnerDeletion': True, 'uid': '0'}]
+    return md
+
+def image_of(app):
+    # one digest per app, all the pods of an owner run the same image
+    return 'quay.io/example/{}@sha256:{}'.format(app, hashlib.sha256(app.encode()).hexdigest())
+
+def make_container(rnd, name, app):
+    return {
+        'name': name,
+        'image': image_of(app),
+        'imagePullPolicy': rnd.choice(['IfNotPresent', 'Always']),
+        'resources': {'requests': {'cpu': '{}m'.format(rnd.choice([1, 10, 100])), 'memory': '{}Mi'.format(rnd.choice([16, 64, 256]))}},
+        'securityContext': rnd.choice(CONTAINER_SECURITY_CONTEXTS),
+        'terminationMessagePath': '/dev/termination-log',
+        'volumeMounts': [{'mountPath': '/var/run/secrets/kubernetes.io/serviceaccount', 'name': 'kube-api-access', 'readOnly': True}],
+    }
+
+def make_pod(rnd, name, ns, node, app, owner_kind, owner_name, containers, host_network=False):
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Pod',
+        'metadata': metadata(name, ns, owner_kind, owner_name),
+        'spec': {
+            'affinity': {'podAntiAffinity': {'requiredDuringSchedulingIgnoredDuringExecution': [{'labelSelector': {'matchLabels': {'app': app}}, 'topologyKey': 'kubernetes.io/hostname'}]}} if rnd.random() < 0.3 else {},
+            'containers': [make_container(rnd, '{}-{}'.format(app, i) if i else app, app) for i in range(containers)],
+            'initContainers': [make_container(rnd, 'init', app)] if rnd.random() < 0.1 else [],
+            'dnsPolicy': 'ClusterFirst',
+            'enableServiceLinks': True,
+            'hostNetwork': host_network,
+            'nodeName': node,
+            'nodeSelector': rnd.choice(NODE_SELECTORS),
+            'preemptionPolicy': 'PreemptLowerPriority',
+            'priority': 2000000000,
+            'priorityClassName': 'system-cluster-critical',
+            'restartPolicy': 'Always',
+            'schedulerName': 'default-scheduler',
+            'securityContext': rnd.choice(SECURITY_CONTEXTS),
+            'serviceAccount': app,
+            'serviceAccountName': app,
+            'terminationGracePeriodSeconds': 30,
+            'tolerations': rnd.choice(TOLERATIONS),
+        },
+        'status': {'phase': 'Running', 'qosClass': 'Burstable', 'hostIP': '10.0.0.1', 'podIP': '10.128.0.1'},
+    }
+
+def make_owner(kind, name, ns, replicas=None, owner_kind=None, owner_name=None):
+    item = {'apiVersion': 'apps/v1', 'kind': kind, 'metadata': metadata(name, ns, owner_kind, owner_name), 'spec': {}, 'status': {}}
+    if replicas is not None:
+        item['spec']['replicas'] = replicas
+    return item
+
+def generate(args):
+    # yields the items of the dump; pods are spread over the ReplicaSets,
+    # Jobs, DaemonSets and static pods in that order
+    rnd = random.Random(args.seed)
+    nodes = ['ip-10-0-{}-{}.ec2.internal'.format(i // 256, i % 256) for i in range(args.nodes)]
+    masters = nodes[:3]
+    remaining = args.pods
+
+    def ns_of(i):
+        return 'ns-{}'.format(i % args.namespaces)
+
+    # static pods, one per master and namespace
+    for ns, prefix in STATIC_POD_NAMESPACES[:args.static_pods]:
+        for node in masters:
+            if remaining <= 0:
+                break
+            yield make_pod(rnd, '{}-{}'.format(prefix, node), ns, node, prefix, 'Node', node, args.containers_per_pod, host_network=True)
+            remaining -= 1
+
+    # daemonsets, one pod per node
+    for i in range(args.daemonsets):
+        app = 'ds{}'.format(i)
+        ns = ns_of(i)
+        for node in nodes:
+            if remaining <= 0:
+                break
+            yield make_pod(rnd, '{}-{}'.format(app, random_suffix(rnd, 5)), ns, node, app, 'DaemonSet', app, args.containers_per_pod, host_network=True)
+            remaining -= 1
+
+    # jobs owned by cronjobs
+    for i in range(args.jobs):
+        app = 'cron{}'.format(i % max(args.jobs // 4, 1))
+        ns = ns_of(i)
+        job = '{}-{}'.format(app, 27000000 + i)
+        if i < max(args.jobs // 4, 1):
+            yield make_owner('CronJob', app, ns)
+        yield make_owner('Job', job, ns, owner_kind='CronJob', owner_name=app)
+        if remaining > 0:
+            yield make_pod(rnd, '{}-{}'.format(job, random_suffix(rnd, 5)), ns, rnd.choice(nodes), app, 'Job', job, args.containers_per_pod)
+            remaining -= 1
+
+    # the rest are deployment pods, the remainder goes one pod each to the
+    # first ReplicaSets so that every spec.replicas matches its pods
+    nrs = max(args.replicasets, 1)
+    per_rs, extra = divmod(max(remaining, 0), nrs)
+    for i in range(nrs):
+        app = 'app{}'.format(i)
+        ns = ns_of(i)
+        rs = '{}-{}'.format(app, random_suffix(rnd, 10))
+        replicas = per_rs + (1 if i < extra else 0)
+        yield make_owner('Deployment', app, ns, replicas=replicas)
+        yield make_owner('ReplicaSet', rs, ns, replicas=replicas, owner_kind='Deployment', owner_name=app)
+        for j in range(replicas):
+            yield make_pod(rnd, '{}-{}'.format(rs, random_suffix(rnd, 5)), ns, rnd.choice(nodes), app, 'ReplicaSet', rs, args.containers_per_pod)
+            remaining -= 1
+
+def write_json(items, f):
+    f.write('{\n    "apiVersion": "v1",\n    "items": [\n')
+    first = True
+    for item in items:
+        if not first:
+            f.write(',\n')
+        f.write(json.dumps(item))
+        first = False
+    f.write('\n    ],\n    "kind": "List",\n    "metadata": {\n        "resourceVersion": ""\n    }\n}\n')
+
+def write_yaml(items, f):
+    f.write('apiVersion: v1\nitems:\n')
+    for item in items:
+        f.write(yaml.dump([item], Dumper=NoAliasDumper, default_flow_style=False))
+    f.write('kind: List\nmetadata:\n  resourceVersion: ""\n')
+
+def add_arguments(parser):
+    parser.add_argument('--pods', type=int, default=10000)
+    parser.add_argument('--replicasets', type=int, help='default: pods / 5')
+    parser.add_argument('--jobs', type=int, help='default: pods / 100')
+    parser.add_argument('--daemonsets', type=int, default=10)
+    parser.add_argument('--static-pods', type=int, default=len(STATIC_POD_NAMESPACES), help='number of static pod namespaces (one pod per master each)')
+    parser.add_argument('--containers-per-pod', type=int, default=2)
+    parser.add_argument('--nodes', type=int, default=50)
+    parser.add_argument('--namespaces', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+
+def fill_defaults(args):
+    if args.replicasets is None:
+        args.replicasets = max(args.pods // 5, 1)
+    if args.jobs is None:
+        args.jobs = args.pods // 100
+    return args
+
+def write_dump(args, output):
+    with open(output, 'w') as f:
+        if output.endswith('.json'):
+            write_json(generate(args), f)
+        else:
+            write_yaml(generate(args), f)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument('--output', default='./synthetic.json', help='.json or .yaml')
+    args = fill_defaults(parser.parse_args())
+    write_dump(args, args.output)
+    print('* wrote {}'.format(args.output))
+    sys.exit()
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+# A stand-in for kubectl that answers the commands of the online mode from a
+# dump, so that the online collection can be run without a cluster:
+#
+#   python3 openshift_pod_summarizer.py --kubectl 'python3 fixtures/fake_kubectl.py' --per-namespace --chunk-size 50
+#
+# FAKE_KUBECTL_DUMP  dump served (default: outputs/v4.11/all_aws_ipi.yaml)
+# FAKE_KUBECTL_FAIL  comma separated kinds whose `get` fails, e.g. replicaset
+# FAKE_KUBECTL_MISSING  comma separated kinds the "server" does not know
+#
+# `get <kind> --watch` prints an ADDED event for every object of the dump, as
+# kubectl does, then the events of that kind from fixtures/watch_events.jsonl
+# and waits to be killed; each kind is a separate process, so the events of
+# different kinds arrive in no fixed order, as with a real cluster:
+#
+#   python3 openshift_pod_summarizer.py watch --kubectl 'python3 fixtures/fake_kubectl.py' --watch-interval 1
+#
+# FAKE_KUBECTL_EVENTS  events replayed (default: fixtures/watch_events.jsonl)
+# FAKE_KUBECTL_EVENT_DELAY  seconds before each replayed event (default: 0)
+# FAKE_KUBECTL_WATCH_EXIT  end the watch after the replayed events, as when the
+#                          api server closes it, instead of waiting
+#
+# The same events can be fed to the watch subcommand directly:
+#
+#   python3 openshift_pod_summarizer.py watch --offline outputs/v4.11/all_aws_ipi.yaml --watch-events fixtures/watch_events.jsonl
+
+import os
+import sys
+import json
+import time
+import tempfile
+
+TOP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, TOP_DIR)
+import openshift_pod_summarizer as ops
+
+DEFAULT_DUMP = os.path.join(TOP_DIR, 'outputs', 'v4.11', 'all_aws_ipi.yaml')
+DEFAULT_EVENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'watch_events.jsonl')
+
+def env_kinds(name):
+    return [kind for kind in os.environ.get(name, '').split(',') if kind]
+
+def load_dump(path):
+    # the dump is parsed once and kept as json in the temp directory, the
+    # online mode runs one fake kubectl per kind (and namespace)
+    st = os.stat(path)
+    cached = os.path.join(tempfile.gettempdir(), 'fake_kubectl-{}.json'.format(ops.obj_digest(os.path.abspath(path), st.st_mtime_ns, st.st_size)))
+    if os.path.exists(cached):
+        with open(cached) as f:
+            return json.load(f)
+    items = list(ops.iter_file_items(path))
+    tmp = '{}.{}.tmp'.format(cached, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(items, f)
+    os.replace(tmp, cached)
+    return items
+
+def load_items(kind, ns):
+    items = []
+    for item in load_dump(os.environ.get('FAKE_KUBECTL_DUMP', DEFAULT_DUMP)):
+        if kind != 'namespace' and item['kind'].lower() != kind:
+            continue
+        if ns and item['metadata'].get('namespace') != ns:
+            continue
+        items.append(item)
+    return items
+
+def get(args):
+    kind = args[0]
+    ns = args[args.index('-n') + 1] if '-n' in args else None
+    if kind in env_kinds('FAKE_KUBECTL_MISSING'):
+        sys.stderr.write('error: the server doesn\'t have a resource type "{}"\n'.format(kind))
+        return 1
+    if kind in env_kinds('FAKE_KUBECTL_FAIL'):
+        sys.stderr.write('Error from server (Forbidden): {} is forbidden\n'.format(kind))
+        return 1
+    items = load_items(kind, ns)
+    if '--watch' in args:
+        return watch(kind, items)
+    if kind == 'namespace':
+        for name in sorted({item['metadata'].get('namespace') for item in items} - {None}):
+            print('namespace/{}'.format(name))
+        return 0
+    # kubectl pretty prints the whole List with 4 spaces
+    json.dump({'apiVersion': 'v1', 'items': items, 'kind': 'List', 'metadata': {'resourceVersion': ''}}, sys.stdout, indent=4)
+    print()
+    return 0
+
+def print_event(event):
+    json.dump(event, sys.stdout, indent=4)
+    print()
+    sys.stdout.flush()
+
+def watch(kind, items):
+    parent = os.getppid()
+    for item in items:
+        print_event({'type': 'ADDED', 'object': item})
+    delay = float(os.environ.get('FAKE_KUBECTL_EVENT_DELAY', '0'))
+    with open(os.environ.get('FAKE_KUBECTL_EVENTS', DEFAULT_EVENTS)) as f:
+        for event in ops.iter_watch_events(f):
+            if event['object'].get('kind', '').lower() not in (kind, 'status'):
+                continue
+            time.sleep(delay)
+            print_event(event)
+    if os.environ.get('FAKE_KUBECTL_WATCH_EXIT'):
+        return 0
+    # a watch only ends when the api server closes it, here when the
+    # summarizer is gone
+    try:
+        while os.getppid() == parent:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:2] == ['auth', 'can-i']:
+        print('yes')
+        sys.exit(0)
+    if args[:1] == ['get']:
+        sys.exit(get(args[1:]))
+    sys.stderr.write('fake_kubectl: unsupported command: {}\n'.format(' '.join(args)))
+    sys.exit(1)
@@ -1,16 +1,97 @@
 #!/usr/bin/python3
 
+# only the modules every subcommand needs are imported here; openpyxl, yaml,
+# pyarrow, subprocess, the profilers and the process pools are imported by
+# the functions that use them, so `--help` or a csv/jsonl run does not pay
+# for the xlsx backend (see benchmarks/bench_import.py)
+import os
 import sys
+import csv
 import copy
+import contextlib
+import collections
+import time
 import json
-import yaml
-import pprint
-import openpyxl
+import re
+import pickle
+import logging
+import fnmatch
 import argparse
-import subprocess
-from urllib.parse import urlparse
-
-alldata = {}
+import threading
+import queue
+
+# prefer orjson when it is installed, it is several times faster than the
+# json module on the files loaded whole (rules, descriptions, single-object
+# dumps); List dumps are streamed item by item with json.JSONDecoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger('openshift_pod_summarizer')
+DEBUG_LOG_BUFFER = 10000
+
+# per-stage timing for --profile, see stage()
+profiling = {'enabled': False}
+
+# fields kept from each object by compact_item(), everything else is dropped
+# while streaming the dump
+POD_SPEC_FIELDS = [
+    'affinity',
+    'dnsPolicy',
+    'enableServiceLinks',
+    'hostNetwork',
+    'hostPID',
+    'nodeName',
+    'nodeSelector',
+    'preemptionPolicy',
+    'priority',
+    'priorityClassName',
+    'restartPolicy',
+    'schedulerName',
+    'serviceAccount',
+    'serviceAccountName',
+    'securityContext',
+    'tolerations',
+    'terminationGracePeriodSeconds',
+]
+CONTAINER_FIELDS = ['name', 'image', 'imagePullPolicy', 'resources', 'securityContext']
+POD_STATUS_FIELDS = ['phase', 'qosClass']
+OWNER_SPEC_FIELDS = ['replicas']
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+PARQUET_BATCH_SIZE = 10000
+SQLITE_BATCH_SIZE = 10000
+
+# resources fetched in online mode
+ONLINE_KINDS = [
+    'pod',
+    'replicaset',
+    'statefulset',
+    'deployment',
+    'catalogsource',
+    'job',
+    'cronjob',
+    'replicationcontroller',
+    'deploymentconfig',
+]
+DEFAULT_KUBECTL_JOBS = 4
+DEFAULT_CHUNK_SIZE = 500
+# seconds between regenerations of the output by the watch subcommand
+DEFAULT_WATCH_INTERVAL = 10
+# seconds before a `kubectl get --watch` that exited is started again
+WATCH_RESTART_DELAY = 5
+
+DICT2YAML_CACHE_SIZE = 4096
+# images listed in the container_image cell of a group, the rest are counted;
+# keeps the cell far below the 32,767 characters of an xlsx cell
+MAX_GROUP_IMAGES = 20
+
+# bump when the cached records change shape or meaning
+CACHE_VERSION = 5
+DEFAULT_CACHE_MAX_MB = 512
+# the compiled description index is kept here when there is no --cache-dir
+DESC_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'openshift_pod_summarizer')
 
 header_labels = [
     'ns',
@@ -46,6 +127,7 @@ header_labels = [
     'container_image',
     'container_imagePullPolicy',
     'container_resources',
+    'container_requests_total',
     'container_securityContext'
 ]
 
@@ -54,19 +136,77 @@ for i, label in enumerate(header_labels, 1):
     # openxl column is 1-origin
     header2column[label] = i
 
-def load_desc(path):
-    desc = {}
-    desc_hash = {}
-    with open(path, 'r') as f:
-        desc = yaml.load(f, Loader=yaml.FullLoader)
-    for item in desc['descriptions']:
-        desc_hash[(item['ns'], item['name'])] = {'desc':item.get('desc', ''), 'url':item.get('url', ''), 'crd':item.get('crd', ''), 'how_to_install':item.get('install', '')}
-    return desc_hash
+EMPTY_DESC = {'desc': '', 'url': '', 'custom_resources': '', 'how_to_install': ''}
+
+def desc_pattern(value):
+    # ns/name containing glob wildcards match as fnmatch patterns
+    if any(c in value for c in '*?['):
+        return re.compile(fnmatch.translate(value))
+    return None
 
-def load_nodes():
+def compile_desc(descriptions):
+    # exact (ns, name) entries go to a dict, the wildcard (`*`, `?`) and
+    # `name_regex` entries to a list tried in file order
+    exact = {}
+    patterns = []
+    for item in descriptions:
+        record = {
+            'desc': item.get('desc', ''),
+            'url': item.get('url', ''),
+            'custom_resources': build_crd_str(item.get('crd') or []),
+            'how_to_install': item.get('install', ''),
+        }
+        ns = item['ns']
+        name = item.get('name', '')
+        ns_re = desc_pattern(ns)
+        if 'name_regex' in item:
+            name_re = re.compile(item['name_regex'])
+        else:
+            name_re = desc_pattern(name)
+        if ns_re or name_re:
+            patterns.append((ns_re or re.compile(re.escape(ns)), name_re or re.compile(re.escape(name)), record))
+        else:
+            exact[(ns, name)] = record
+    return {'exact': exact, 'patterns': patterns}
+
+def load_desc(path, cache=None):
+    # the compiled index is kept in one cache entry per description file,
+    # in DESC_CACHE_DIR without --cache-dir, and reused while the mtime and
+    # size of the file are unchanged
+    stamp = file_stamp(path)
+    key = obj_digest('description', CACHE_VERSION, stamp[0])
+    if not cache:
+        try:
+            cache = open_cache(DESC_CACHE_DIR)
+        except OSError as e:
+            logger.debug('** no description index cache: %s', e)
+    if cache:
+        entry = cache_get(cache, key)
+        if entry is not None and entry[0] == stamp:
+            desc = entry[1]
+            logger.info('** description index from cache (%s exact, %s patterns)', len(desc['exact']), len(desc['patterns']))
+            return desc
+    desc = compile_desc(load_input_file(path)['descriptions'])
+    if cache:
+        try:
+            cache_put(cache, key, (stamp, desc))
+        except OSError as e:
+            logger.debug('** description index not cached: %s', e)
+    return desc
+
+def find_desc(desc, ns, pod_name):
+    record = desc['exact'].get((ns, pod_name))
+    if record is not None:
+        return record
+    for ns_re, name_re, record in desc['patterns']:
+        if ns_re.fullmatch(ns) and name_re.fullmatch(pod_name):
+            return record
+    return EMPTY_DESC
+
+def load_nodes(json_data):
     masters = []
     workers = []
-    for item in alldata['Node']:
+    for item in json_data['Node']:
         hostname = item['metadata']['name']
         labels = item['metadata']['labels']
         if 'node-role.kubernetes.io/master' in labels:
@@ -94,35 +234,491 @@ def load_nodes():
 # 
 #     return json_data
 
-def load_offline_data(json_files):
+def start_profiling():
+    profiling.update({
+        'enabled': True,
+        'start': time.perf_counter(),
+        'last': time.perf_counter(),
+        'stack': [],
+        'totals': collections.defaultdict(float),
+        'counts': collections.Counter(),
+    })
+    import tracemalloc
+    tracemalloc.start()
+
+@contextlib.contextmanager
+def stage(name):
+    # exclusive time: while a nested stage runs, the outer one is paused
+    if not profiling['enabled']:
+        yield
+        return
+    now = time.perf_counter()
+    stack = profiling['stack']
+    if stack:
+        profiling['totals'][stack[-1]] += now - profiling['last']
+    stack.append(name)
+    profiling['last'] = now
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        profiling['totals'][stack.pop()] += now - profiling['last']
+        profiling['counts'][name] += 1
+        profiling['last'] = now
+
+def report_profiling():
+    import tracemalloc
+    total = time.perf_counter() - profiling['start']
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    profiling['enabled'] = False
+    totals = dict(profiling['totals'])
+    totals['(other)'] = max(total - sum(totals.values()), 0)
+    logger.info('** profile: %-20s %10s %10s %6s', 'stage', 'calls', 'sec', '%')
+    for name, sec in sorted(totals.items(), key=lambda x: x[1], reverse=True):
+        logger.info('** profile: %-20s %10s %10.3f %5.1f%%', name, profiling['counts'].get(name, ''), sec, sec / total * 100 if total else 0)
+    logger.info('** profile: %-20s %10s %10.3f', 'total', '', total)
+    logger.info('** profile: peak traced memory %.1f MB (current %.1f MB)', peak / 1024 / 1024, current / 1024 / 1024)
+
+def run_profiled(args):
+    import cProfile
+    start_profiling()
+    profiler = cProfile.Profile() if args.profile_out else None
+    if profiler:
+        profiler.enable()
+    try:
+        main(args)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile_out)
+            logger.info('** profile: cProfile stats written to %s (python3 -m pstats %s)', args.profile_out, args.profile_out)
+        report_profiling()
+
+def yaml_loader():
+    # prefer libyaml when it is installed, it is several times faster than
+    # the pure python parser on large dumps
+    import yaml
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def yaml_dumper():
+    import yaml
+    return getattr(yaml, 'CDumper', yaml.Dumper)
+
+def parse_json(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def load_input_file(file):
+    # returns None for an unsupported suffix
+    start = time.perf_counter()
+    if file.endswith('.json'):
+        with open(file, 'rb') as f:
+            data = parse_json(f.read())
+        parser = 'orjson' if orjson else 'json'
+    elif file.endswith('.yaml') or file.endswith('.yml'):
+        import yaml
+        loader = yaml_loader()
+        with open(file, 'rb') as f:
+            data = yaml.load(f, Loader=loader)
+        parser = loader.__name__
+    else:
+        logger.warning('unsupported file suffix: %s', file)
+        return None
+    logger.info('** loaded %s with %s in %.3f sec', file, parser, time.perf_counter() - start)
+    return data
+
+JSON_TOKEN_RE = re.compile(r'["{}\[\]]')
+JSON_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"')
+JSON_COLON_RE = re.compile(r'\s*(?::\s*(\[)?)?')
+JSON_SEPARATOR_RE = re.compile(r'[\s,]*')
+
+def find_json_items(buf, pos, depth):
+    # scans buf from pos for the "items" key of the top-level object,
+    # skipping strings and anything nested deeper (e.g. the "items" of a
+    # configMap volume in a single Pod); returns (end of the '[' or None,
+    # pos to resume from, depth), the resume pos stays before a token that
+    # is cut at the end of buf
+    while True:
+        m = JSON_TOKEN_RE.search(buf, pos)
+        if not m:
+            return None, len(buf), depth
+        c = m.group()
+        if c in '{[':
+            depth += 1
+        elif c in '}]':
+            depth -= 1
+        else:
+            s = JSON_STRING_RE.match(buf, m.start())
+            if not s:
+                return None, m.start(), depth
+            if depth == 1 and s.group() == '"items"':
+                colon = JSON_COLON_RE.match(buf, s.end())
+                if colon.end() == len(buf):
+                    # the ':' or '[' may be in the next chunk
+                    return None, m.start(), depth
+                if colon.group(1):
+                    return colon.end(), colon.end(), depth
+            pos = s.end()
+            continue
+        pos = m.end()
+
+def iter_json_items(f, chunk_size=STREAM_CHUNK_SIZE):
+    # yields the elements of the top-level "items" array one by one, only
+    # the current chunk (and at most one partially read item) is in memory
+    decoder = json.JSONDecoder()
+    buf = ''
+    scan_pos = 0
+    depth = 0
+    while True:
+        items_pos, scan_pos, depth = find_json_items(buf, scan_pos, depth)
+        if items_pos is not None:
+            break
+        chunk = f.read(chunk_size)
+        if not chunk:
+            # not a List, a single object
+            data = parse_json(buf) if buf.strip() else None
+            if isinstance(data, dict) and data.get('kind'):
+                yield data
+            return
+        buf += chunk
+
+    pos = items_pos
+    read_size = chunk_size
+    while True:
+        pos = JSON_SEPARATOR_RE.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            if pos >= len(buf):
+                raise ValueError('need more data')
+            item, pos = decoder.raw_decode(buf, pos)
+        except ValueError:
+            chunk = f.read(read_size)
+            if not chunk:
+                raise ValueError('truncated "items" array in {}'.format(getattr(f, 'name', 'input')))
+            buf = buf[pos:] + chunk
+            pos = 0
+            # an item larger than the buffer, grow reads so that re-parsing stays linear
+            read_size = max(chunk_size, len(buf))
+            continue
+        read_size = chunk_size
+        if pos > chunk_size:
+            buf = buf[pos:]
+            pos = 0
+        yield item
+
+def iter_yaml_items(f, chunk_size=STREAM_CHUNK_SIZE):
+    # kubectl -o yaml prints every element of "items" as a block sequence
+    # entry, so the file can be split on the '- ' lines and each batch of
+    # entries parsed on its own
+    import yaml
+    loader = yaml_loader()
+    header = []
+    lines = []
+    nbytes = 0
+    in_items = False
+    seen_items = False
+    item_indent = None
+
+    def flush():
+        if not lines:
+            return []
+        items = yaml.load(''.join(lines), Loader=loader) or []
+        lines.clear()
+        return items
+
+    for line in f:
+        if not in_items:
+            if line.startswith('items:'):
+                in_items = line[len('items:'):].strip() == ''
+                seen_items = True
+                item_indent = None
+            else:
+                header.append(line)
+            continue
+
+        stripped = line.lstrip(' ')
+        if stripped.strip() == '' or stripped.startswith('#'):
+            lines.append(line)
+            continue
+        indent = len(line) - len(stripped)
+        if item_indent is None:
+            item_indent = indent
+        is_entry = indent == item_indent and (stripped.startswith('- ') or stripped.rstrip('\n') == '-')
+        if indent <= item_indent and not is_entry:
+            # end of the items sequence
+            yield from flush()
+            nbytes = 0
+            in_items = False
+            header.append(line)
+            continue
+        if is_entry and nbytes > chunk_size:
+            yield from flush()
+            nbytes = 0
+        lines.append(line)
+        nbytes += len(line)
+    yield from flush()
+
+    if not seen_items and header:
+        # no "items:" sequence at all, fall back to parsing the documents
+        # (e.g. a dump written in flow/json syntax)
+        for data in yaml.load_all(''.join(header), Loader=loader):
+            if not isinstance(data, dict):
+                continue
+            if data.get('kind') == 'List':
+                yield from (item for item in data.get('items') or [] if isinstance(item, dict))
+            elif data.get('kind'):
+                yield data
+
+def iter_file_items(file):
+    if file.endswith('.json'):
+        with open(file, 'r') as f:
+            yield from iter_json_items(f)
+    elif file.endswith('.yaml') or file.endswith('.yml'):
+        with open(file, 'r') as f:
+            yield from iter_yaml_items(f)
+    else:
+        logger.warning('unsupported file suffix: %s', file)
+
+def compact_item(item):
+    # keep only what the summarizer reads, so the rest of the dump can be freed
+    kind = item['kind']
+    md = item['metadata']
+    spec = item.get('spec') or {}
+    new_md = {'name': md['name']}
+    for key in ('namespace', 'resourceVersion'):
+        if key in md:
+            new_md[key] = md[key]
+    refs = md.get('ownerReferences')
+    if refs:
+        new_md['ownerReferences'] = [{'kind': ref['kind'], 'name': ref['name']} for ref in refs]
+    if kind == 'Node':
+        new_md['labels'] = md.get('labels', {})
+    new_item = {'kind': kind, 'metadata': new_md}
+
+    if kind == 'Pod':
+        new_spec = {key: spec[key] for key in POD_SPEC_FIELDS if key in spec}
+        for key in ('initContainers', 'containers'):
+            if key in spec:
+                new_spec[key] = [{field: ctr[field] for field in CONTAINER_FIELDS if field in ctr} for ctr in spec[key]]
+        status = item.get('status') or {}
+        new_item['status'] = {key: status[key] for key in POD_STATUS_FIELDS if key in status}
+    else:
+        new_spec = {key: spec[key] for key in OWNER_SPEC_FIELDS if key in spec}
+    new_item['spec'] = new_spec
+    return new_item
+
+def append_item(json_data, item):
+    kind = item['kind']
+    if not json_data.get(kind):
+        json_data[kind] = []
+    json_data[kind].append(item)
+
+def add_item(json_data, item):
+    append_item(json_data, compact_item(item))
+
+def kubectl_get_items(kubectl, kind, ns, chunk_size):
+    # streams the items of `kubectl get` while kubectl is still paginating
+    import subprocess
+    import tempfile
+    cmd = kubectl.split() + ['get', kind, '-o', 'json', '--chunk-size={}'.format(chunk_size)]
+    cmd += ['-n', ns] if ns else ['-A']
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, text=True)
+        try:
+            yield from iter_json_items(proc.stdout)
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+        if returncode != 0:
+            err.seek(0)
+            message = err.read().decode(errors='replace').strip()
+            if "doesn't have a resource type" in message:
+                # e.g. deploymentconfig with the DeploymentConfig capability
+                # disabled, there is nothing of that kind to own a pod
+                logger.warning('** `%s` failed: %s', ' '.join(cmd), message)
+            else:
+                # a partial list would leave pods with owners that cannot be found
+                logger.error('** `%s` failed: %s, exit', ' '.join(cmd), message)
+                sys.exit(1)
+
+def kubectl_check(kubectl):
+    # the online mode needs to list pods in every namespace
+    import subprocess
+    try:
+        output = subprocess.run(kubectl.split() + ['auth', 'can-i', 'list', 'pods', '-A'], capture_output=True, text=True)
+    except OSError as e:
+        logger.error('* %s', e)
+        return False
+    return output.returncode == 0
+
+def kubectl_list_namespaces(kubectl):
+    import subprocess
+    cmd = kubectl.split() + ['get', 'namespace', '-o', 'name']
+    output = subprocess.run(cmd, capture_output=True, text=True)
+    namespaces = [line.split('/', 1)[-1] for line in output.stdout.split()]
+    if output.returncode != 0 or not namespaces:
+        # without namespaces nothing would be fetched at all
+        logger.error('** `%s` failed: %s, exit', ' '.join(cmd), output.stderr.strip() or 'no namespaces')
+        sys.exit(1)
+    return namespaces
+
+def collect_online(json_data, kubectl='kubectl', jobs=DEFAULT_KUBECTL_JOBS, chunk_size=DEFAULT_CHUNK_SIZE, per_namespace=False):
+    # one kubectl per kind (and per namespace), at most `jobs` at a time
+    import concurrent.futures
+    namespaces = kubectl_list_namespaces(kubectl) if per_namespace else [None]
+    tasks = [(kind, ns) for kind in ONLINE_KINDS for ns in namespaces]
+    lock = threading.Lock()
+
+    def fetch(kind, ns):
+        start = time.perf_counter()
+        nitems = 0
+        for item in kubectl_get_items(kubectl, kind, ns, chunk_size):
+            item = compact_item(item)
+            with lock:
+                append_item(json_data, item)
+            nitems += 1
+        return nitems, time.perf_counter() - start
+
+    logger.info('** json from %s concurrent `%s get <kind> -o json --chunk-size=%s` (%s tasks)', jobs, kubectl, chunk_size, len(tasks))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(fetch, kind, ns): (kind, ns) for kind, ns in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            kind, ns = futures[future]
+            nitems, elapsed = future.result()
+            logger.info('** fetched %s %s items%s in %.3f sec', nitems, kind, ' from ' + ns if ns else '', elapsed)
+
+def file_digest(path):
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_stamp(path):
+    # cheap stand-in for file_digest of small files that are edited in place
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+def obj_digest(*objs):
+    import hashlib
+    return hashlib.sha256(json.dumps(objs, sort_keys=True, default=str).encode()).hexdigest()
+
+def open_cache(cache_dir, max_mb=DEFAULT_CACHE_MAX_MB, salt=''):
+    # on-disk cache of pickled values, one file per key; salt is mixed into
+    # the keys of values that depend on more than the key itself
+    if not cache_dir:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    return {'dir': cache_dir, 'max_bytes': max_mb * 1024 * 1024, 'salt': salt, 'hits': 0, 'misses': 0}
+
+def cache_path(cache, key):
+    return os.path.join(cache['dir'], key[:2], key + '.pickle')
+
+@contextlib.contextmanager
+def gc_paused():
+    # (un)pickling a whole dump creates or walks millions of small objects,
+    # the cyclic gc passes triggered meanwhile find nothing to free and more
+    # than double the time
+    import gc
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def cache_get(cache, key):
+    path = cache_path(cache, key)
+    try:
+        with open(path, 'rb') as f, gc_paused():
+            value = pickle.load(f)
+        # mtime is the last use for the LRU eviction
+        os.utime(path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        cache['misses'] += 1
+        return None
+    cache['hits'] += 1
+    return value
+
+def cache_put(cache, key, value):
+    path = cache_path(cache, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f, gc_paused():
+        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def cache_evict(cache):
+    # drop the least recently used entries until the cache fits max_bytes
+    entries = []
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(cache['dir']):
+        for name in filenames:
+            if not name.endswith('.pickle'):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    entries.sort()
+    nevicted = 0
+    for mtime, size, path in entries:
+        if total <= cache['max_bytes']:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+        nevicted += 1
+    logger.info('** cache: %s hits, %s misses, %s evicted, %.1f MB in %s', cache['hits'], cache['misses'], nevicted, total / 1024 / 1024, cache['dir'])
+
+def load_offline_data(json_files, cache=None, **online_opts):
     json_data = {}
-    json_data['raw'] = []
     if json_files:
+        if cache:
+            # what the pod summaries are kept for, see load_pod_memo()
+            cache['source'] = []
         for file in json_files:
-            if file.endswith('.json'):
-                with open(file, 'r') as f:
-                    print('** json from {}'.format(file))
-                    json_data['raw'].append(json.load(f))
-            elif file.endswith('.yaml') or file.endswith('.yml'):
-                with open(file, 'r') as f:
-                    print('** json from {}'.format(file))
-                    json_data['raw'].append(yaml.load(f, Loader=yaml.FullLoader))
+            logger.info('** json from %s', file)
+            start = time.perf_counter()
+            items = None
+            if cache:
+                digest = file_digest(file)
+                cache['source'].append(digest)
+                key = obj_digest(CACHE_VERSION, 'file', digest)
+                items = cache_get(cache, key)
+            if items is None:
+                items = []
+                with stage('parse'):
+                    for item in iter_file_items(file):
+                        items.append(compact_item(item))
+                if cache:
+                    cache_put(cache, key, items)
+                logger.info('** streamed %s items from %s in %.3f sec', len(items), file, time.perf_counter() - start)
             else:
-                print('unsupported file suffix:', file)
+                logger.info('** %s items from %s found in cache in %.3f sec', len(items), file, time.perf_counter() - start)
+            for item in items:
+                append_item(json_data, item)
 
     else:
-        print('** json from `kubectl get -A pod,replicaset,statefulset,deployment,catalogsource,job,cronjob,replicationcontroller,deploymentconfig -o json`')
-        output = subprocess.run('kubectl get -A pod,replicaset,statefulset,deployment,catalogsource,job,cronjob,replicationcontroller,deploymentconfig -o json'.split(), capture_output=True)
-        json_data['raw'].append(json.loads(output.stdout))
+        if cache:
+            cache['source'] = ['online', online_opts.get('kubectl')]
+        with stage('collect'):
+            collect_online(json_data, **online_opts)
 
-    for data in json_data['raw']:
-        for item in data['items']:
-            kind = item['kind']
-            if not json_data.get(kind):
-                json_data[kind] = []
-            json_data[kind].append(item)
-
-    json_data['Pod'].sort(key=lambda x: (x['metadata']['namespace'], x['metadata']['name']))
+    with stage('index'):
+        json_data['index'] = build_resource_index(json_data)
+        json_data.setdefault('Pod', [])
+        json_data['Pod'].sort(key=lambda x: (x['metadata']['namespace'], x['metadata']['name']))
 
     return json_data
 
@@ -137,6 +733,7 @@ def hostname2role(hostname):
     return role
 
 def print_nodes(masters, workers):
+    import pprint
     print('# masters:')
     pprint.pprint(masters)
     print('# workers:')
@@ -150,141 +747,234 @@ def write_row(sheet, array, start_row, start_col, color):
 def dict2json(obj):
     return json.dumps(obj, indent=2)
 
+# canonical json of the fragment -> rendered yaml, least recently used first
+dict2yaml_cache = collections.OrderedDict()
+dict2yaml_stats = {'hits': 0, 'misses': 0}
+
 def dict2yaml(obj):
-    return yaml.dump(obj, Dumper=yaml.Dumper).rstrip()
+    # the same tolerations, securityContexts, ... repeat across a cluster, so
+    # render every distinct fragment only once
+    key = json.dumps(obj, sort_keys=True, default=str)
+    value = dict2yaml_cache.get(key)
+    if value is not None:
+        dict2yaml_cache.move_to_end(key)
+        dict2yaml_stats['hits'] += 1
+        return value
+    dict2yaml_stats['misses'] += 1
+    import yaml
+    with stage('yaml render'):
+        value = yaml.dump(obj, Dumper=yaml_dumper()).rstrip()
+    dict2yaml_cache[key] = value
+    if len(dict2yaml_cache) > DICT2YAML_CACHE_SIZE:
+        dict2yaml_cache.popitem(last=False)
+    return value
+
+def print_dict2yaml_stats():
+    total = dict2yaml_stats['hits'] + dict2yaml_stats['misses']
+    rate = dict2yaml_stats['hits'] / total * 100 if total else 0
+    logger.info('** dict2yaml (%s): %s calls, %s hits (%.1f%%), %s cached', yaml_dumper().__name__ if total else '-', total, dict2yaml_stats['hits'], rate, len(dict2yaml_cache))
 
 def ns_pod_key(ns, pod):
     return '{}__{}'.format(ns, pod)
 
-# def normalize_pod_name(name, owner_kind, node_name):
+def mask_segments(name, masks):
+    array = name.split('-')
+    for index, width in masks:
+        if -len(array) <= index < len(array):
+            array[index] = 'X' * width
+    return '-'.join(array)
+
+def mask_tail(name, n):
+    return name[0:-n] + 'X' * n
+
+def replace_node(name, node_name, replacement):
+    if not node_name:
+        return name
+    return name.replace(node_name, replacement)
+
+def compile_steps(steps):
+    # a list of steps from normalize_rules.yaml -> f(name, node_name)
+    funcs = []
+    for step in steps:
+        (op, arg), = step.items()
+        if op == 'mask_segments':
+            funcs.append(lambda name, node_name, masks=sorted(arg.items()): mask_segments(name, masks))
+        elif op == 'mask_tail':
+            funcs.append(lambda name, node_name, n=arg: mask_tail(name, n))
+        elif op == 'replace_node':
+            funcs.append(lambda name, node_name, replacement=arg: replace_node(name, node_name, replacement))
+        elif op == 'replace':
+            funcs.append(lambda name, node_name, replacement=arg: replacement)
+        else:
+            raise ValueError('unknown normalize rule step: {}'.format(op))
+
+    def apply(name, node_name):
+        for func in funcs:
+            name = func(name, node_name)
+        return name
+    return apply
+
+def compile_rules(rules):
+    # dispatch maps keyed by owner kind (and namespace) plus one combined
+    # regex for the prefix rules, so the cost per pod does not grow with
+    # the number of rules
+    compiled = {}
+    pod_name = rules.get('pod_name', {})
+    compiled['pod_name'] = {kind: compile_steps(steps) for kind, steps in pod_name.get('owner_kinds', {}).items()}
+    prefixes = pod_name.get('prefixes', [])
+    compiled['pod_name_prefixes'] = [compile_steps(rule['steps']) for rule in prefixes]
+    compiled['pod_name_prefix_re'] = None
+    if prefixes:
+        compiled['pod_name_prefix_re'] = re.compile('|'.join('({})'.format(re.escape(rule['prefix'])) for rule in prefixes))
+
+    owner_name = rules.get('owner_name', {})
+    compiled['owner_name'] = {kind: compile_steps(steps) for kind, steps in owner_name.get('owner_kinds', {}).items()}
+
+    num_of_pods = rules.get('num_of_pods', {})
+    daemonset = num_of_pods.get('daemonset', {})
+    compiled['daemonset_no_selector'] = daemonset.get('no_selector', '')
+    compiled['daemonset_selectors'] = [(rule['label'], rule['value'], rule['text']) for rule in daemonset.get('selectors', [])]
+    compiled['daemonset_default'] = daemonset.get('default', '')
+    static_pods = {}
+    for rule in num_of_pods.get('static_pods', []):
+        for kind in rule['owner_kinds']:
+            for ns in rule['namespaces']:
+                static_pods.setdefault((kind, ns), []).append((rule.get('prefix', ''), rule['text']))
+    compiled['static_pods'] = static_pods
+    compiled['no_count_owner_kinds'] = set(num_of_pods.get('no_count_owner_kinds', []))
+    return compiled
+
+DEFAULT_RULES_YAML = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'normalize_rules.yaml')
+normalize_rules = None
+
+def load_rules(path=DEFAULT_RULES_YAML):
+    global normalize_rules
+    normalize_rules = compile_rules(load_input_file(path))
+    return normalize_rules
+
+def get_rules():
+    if normalize_rules is None:
+        load_rules()
+    return normalize_rules
+
 def normalize_pod_name(pod):
     md = pod['metadata']
     refs = md.get('ownerReferences') 
     spec = pod['spec']
     name = md['name']
     owner_kind = refs[0]['kind'] if refs else ''
-    node_name = spec['nodeName']
+    node_name = spec.get('nodeName', '')
 
-    array = name.split('-')
-    if len(array) == 1:
+    if '-' not in name:
         return name
-    if owner_kind == 'DaemonSet' or owner_kind == 'CatalogSource':
-        # array[-1] = 'X' * len(array[-1])
-        array[-1] = 'X' * 5
-        return '-'.join(array)
-    if owner_kind == 'ReplicaSet' or owner_kind == 'Job':
-        # array[-2] = 'X' * len(array[-2])
-        array[-2] = 'X' * 10
-        # array[-1] = 'X' * len(array[-1])
-        array[-1] = 'X' * 5
-        return '-'.join(array)
-    if owner_kind == 'StatefulSet':
-        return name[0:-1] + 'X'
-    if owner_kind == 'Node':
-        return name.replace(node_name, 'HOSTNAME')
-    if owner_kind == 'ConfigMap':
-        array = name.replace(node_name, 'HOSTNAME').split('-')
-        array[-2] = 'X'
-        return '-'.join(array)
-    if name.startswith('etcd-guard') or name.startswith('kube-apiserver-guard') or name.startswith('kube-controller-manager-guard') or name.startswith('openshift-kube-scheduler-guard'):
-        return name.replace(node_name, 'HOSTNAME')
+    rules = get_rules()
+    rule = rules['pod_name'].get(owner_kind)
+    if rule:
+        return rule(name, node_name)
+    if rules['pod_name_prefix_re']:
+        m = rules['pod_name_prefix_re'].match(name)
+        if m:
+            return rules['pod_name_prefixes'][m.lastindex - 1](name, node_name)
     return name
 
 def normalize_owner_name(owner_kind, owner_name):
-    print('  XXX normalize_owner_name():owner_kind={}, owner_name={}'.format(owner_kind, owner_name))
-    array = owner_name.split('-')
-    if owner_kind == 'ReplicaSet' or owner_kind == 'Job':
-        # array[-1] = 'X' * len(array[-1])
-        array[-1] = 'X' * 10
-        return '-'.join(array)
-    if owner_kind == 'Node':
-        return 'HOSTNAME'
+    logger.debug('  XXX normalize_owner_name():owner_kind=%s, owner_name=%s', owner_kind, owner_name)
+    rule = get_rules()['owner_name'].get(owner_kind)
+    if rule:
+        return rule(owner_name, '')
     return owner_name
 
-def find_resource_json(kind, ns, name):
-    if alldata.get(kind):
-        for item in alldata[kind]:
-            if item['metadata']['namespace'] == ns and item['metadata']['name'] == name:
-                return item
-    return None
-    
-def normalize_owner_kind(owner_kind, owner_name, ns):
-    print('  XXX normalize_owner_kind():owner_kind={}, owner_name={}, ns={}'.format(owner_kind, owner_name, ns))
-    if owner_kind == 'ReplicaSet' or owner_kind == 'Job':
-        json_data = find_resource_json(owner_kind, ns, owner_name)
+def build_resource_index(json_data):
+    # (kind, ns, name) -> item, built once so that owner lookups are O(1)
+    index = {}
+    for kind, items in json_data.items():
+        # pods are never owners, leaving them out lets them be freed once
+        # they are summarized
+        if kind in ('index', 'Pod'):
+            continue
+        for item in items:
+            md = item['metadata']
+            index[(kind, md.get('namespace', ''), md['name'])] = item
+    return index
+
+def find_resource_json(index, kind, ns, name):
+    # index is the 'index' of load_offline_data()
+    return index.get((kind, ns, name))
+
+def find_owner_chain(index, owner_kind, owner_name, ns):
+    # walk ownerReferences upwards, e.g. ReplicaSet -> Deployment, Job -> CronJob
+    chain = [(owner_kind, owner_name)]
+    seen = {(owner_kind, owner_name)}
+    json_data = find_resource_json(index, owner_kind, ns, owner_name)
+    while json_data:
         refs = json_data['metadata'].get('ownerReferences')
-        if refs:
-            owner_owner_kind = refs[0]['kind']
+        if not refs:
+            break
+        ref = (refs[0]['kind'], refs[0]['name'])
+        if ref in seen:
+            break
+        seen.add(ref)
+        chain.append(ref)
+        json_data = find_resource_json(index, ref[0], ns, ref[1])
+    return chain
+
+def normalize_owner_kind(index, owner_kind, owner_name, ns):
+    logger.debug('  XXX normalize_owner_kind():owner_kind=%s, owner_name=%s, ns=%s', owner_kind, owner_name, ns)
+    if owner_kind == 'ReplicaSet' or owner_kind == 'Job':
+        chain = find_owner_chain(index, owner_kind, owner_name, ns)
+        if len(chain) > 1:
+            owner_owner_kind = chain[1][0]
             return '{} ({})'.format(owner_kind, owner_owner_kind)
     return owner_kind
 
-def get_number_of_pods(selector, owner_kind, owner_name, pod, ns):
-    print('  XXX get_number_of_pods():selector={}, owner_kind={}, owner_name={}, pod={}, ns={}'.format(selector, owner_kind, owner_name, pod, ns))
+def get_number_of_pods(index, selector, owner_kind, owner_name, pod, ns):
+    logger.debug('  XXX get_number_of_pods():selector=%s, owner_kind=%s, owner_name=%s, pod=%s, ns=%s', selector, owner_kind, owner_name, pod, ns)
+    rules = get_rules()
     if owner_kind == 'DaemonSet':
-        print('  ### selector:{}'.format(selector))
-        # if 'node-role.kubernetes.io/master' in selector:
+        logger.debug('  ### selector:%s', selector)
         if not selector:
-            return '# of nodes'
-        if selector.get('node-role.kubernetes.io/master') == '':
-            return '# of masters'
-        # if 'node-role.kubernetes.io/worker' in selector:
-        if selector.get('node-role.kubernetes.io/worker') == '':
-            return '# of workers'
-        if selector.get('kubernetes.io/os') == 'linux' or selector.get('beta.kubernetes.io/os') == 'linux':
-            return '# of linux nodes'
-        return 'unknown'
-
-    if owner_kind == 'Node' and ns == 'openshift-etcd':
-        return 'Static Pod on masters'
-    if owner_kind == 'ConfigMap' and ns == 'openshift-etcd':
-        return 'Pod for maintaining Static Pod'
-    if owner_kind == 'Node' and ns == 'openshift-kube-apiserver':
-        return 'Static Pod on masters'
-    if owner_kind == 'ConfigMap' and ns == 'openshift-kube-apiserver':
-        return 'Pod for maintaining Static Pod'
-    if owner_kind == 'Node' and ns == 'openshift-kube-controller-manager':
-        return 'Static Pod on masters'
-    if owner_kind == 'ConfigMap' and ns == 'openshift-kube-controller-manager':
-        return 'Pod for maintaining Static Pod'
-    if owner_kind == 'Node' and ns == 'openshift-kube-scheduler':
-        return 'Static Pod on masters'
-    if owner_kind == 'ConfigMap' and ns == 'openshift-kube-scheduler':
-        return 'Pod for maintaining Static Pod'
-    if owner_kind == 'Node' and (ns == 'openshift-kni-infra' or ns == 'openshift-nutanix-infra' or ns == 'openshift-openstack-infra' or ns == 'openshift-ovirt-infra' or ns == 'openshift-vsphere-infra'):
-        if pod.startswith('haproxy'):
-            return 'Static Pod on masters'
-        else:
-            return 'Static Pod on masters and workers'
+            return rules['daemonset_no_selector']
+        for label, value, text in rules['daemonset_selectors']:
+            if selector.get(label) == value:
+                return text
+        return rules['daemonset_default']
 
-    if owner_kind == 'CatalogSource' or owner_kind == 'Job':
+    for prefix, text in rules['static_pods'].get((owner_kind, ns), []):
+        if pod.startswith(prefix):
+            return text
+
+    if owner_kind in rules['no_count_owner_kinds']:
         return ''
 
-    json_data = find_resource_json(owner_kind, ns, owner_name)
+    json_data = find_resource_json(index, owner_kind, ns, owner_name)
+    if json_data is None:
+        # not listed, e.g. in the watch subcommand a pod of a new ReplicaSet
+        # whose own event has not arrived yet, or a ReplicaSet deleted before
+        # its pods; the pod is summarized again when the owner event arrives
+        logger.debug('  ### owner %s %s/%s not found', owner_kind, ns, owner_name)
+        return 'replicas=unknown'
     replicas = json_data['spec'].get('replicas')
     return 'replicas={}'.format(replicas)
 
 def xls_input_cell_by_key(sheet, row, key, value):
+    import openpyxl
     sheet.cell(row=row, column=header2column[key], value=value)
     sheet.cell(row=row, column=header2column[key]).alignment = openpyxl.styles.Alignment(vertical='center')
     sheet.cell(row=row, column=header2column[key]).font = openpyxl.styles.fonts.Font(name='Source Code Pro Medium')
 
-def make_container_cells(sheet, current_row, ctr, is_init_container):
-    xls_input_cell_by_key(sheet, current_row, 'container_name', ctr.get('name', ''))
-    xls_input_cell_by_key(sheet, current_row, 'initContainer', str(is_init_container).lower() if is_init_container else '')
-    xls_input_cell_by_key(sheet, current_row, 'container_image', ctr.get('image', ''))
-    xls_input_cell_by_key(sheet, current_row, 'container_imagePullPolicy', ctr.get('imagePullPolicy', ''))
-    xls_input_cell_by_key(sheet, current_row, 'container_resources', dict2yaml(ctr.get('resources', '')))
-    xls_input_cell_by_key(sheet, current_row, 'container_securityContext', dict2yaml(ctr.get('securityContext', '')))
-
-def get_desc_info(desc_hash, ns, pod_name, key):
-    desc = desc_hash.get((ns, pod_name), None)
-    if desc:
-        return desc.get(key, '')
-    return ''
-
-def build_crd_str(desc, ns, pod_name):
+def make_container_summary(ctr, is_init_container):
+    return ContainerSummary(
+        ctr.get('name', ''),
+        str(is_init_container).lower() if is_init_container else '',
+        ctr.get('image', ''),
+        ctr.get('imagePullPolicy', ''),
+        dict2yaml(ctr.get('resources', '')),
+        '',
+        dict2yaml(ctr.get('securityContext', '')),
+    )
+
+def build_crd_str(crds):
     all_crd_str = ''
-    crds = get_desc_info(desc, ns, pod_name, 'crd')
     # print('  => !!! crds={}'.format(crds))
     for crd in crds:
         kind = crd.get('kind')
@@ -305,16 +995,12 @@ def build_crd_str(desc, ns, pod_name):
     # print('  => !!! all_crd_str={}'.format(all_crd_str))
     return all_crd_str
 
-def set_cell_hyperlink(cell, url):
-    if url == None or url == '':
-        return
-
+def url2link_text(url):
+    from urllib.parse import urlparse
     parse_result = urlparse(url)
 
     if parse_result.path == '/':
-        cell.value = url
-        cell.hyperlink = url
-        return
+        return url
 
     path = parse_result.path[1:]
     if path[-1] == '/':
@@ -323,8 +1009,13 @@ def set_cell_hyperlink(cell, url):
     dirs = path.split('/')
     if len(dirs) >= 2:
         path = '/'.join(dirs[:2])
+    return path
+
+def set_cell_hyperlink(cell, url):
+    if url == None or url == '':
+        return
 
-    cell.value = path
+    cell.value = url2link_text(url)
     cell.hyperlink = url
 
 def set_cell_wrap_text(cell):
@@ -332,217 +1023,1325 @@ def set_cell_wrap_text(cell):
     new_alignment.wrapText = True
     cell.alignment = new_alignment
 
-def main(args):
-    desc = load_desc(args.description_yaml)
-    global alldata
-    alldata = load_offline_data(args.offline)
-    # masters, workers = load_nodes()
-    # print_nodes(masters, workers)
-
-    book = openpyxl.Workbook()
-    sheet = book.active
-    sheet.title = 'Pods'
-    current_row = 1
-    fill_header = openpyxl.styles.PatternFill(patternType='solid', fgColor='D9EAD3')
-    # sheet.freeze_panes = 'A2'
-    sheet.freeze_panes = 'C2'
-
-    pod_exists = {}
-
-    write_row(sheet, header_labels, 1, 1, fill_header)
-    current_row = current_row + 1
+# columns shared by all container rows of a pod, merged vertically in xlsx
+pod_columns = header_labels[header_labels.index('ns'):header_labels.index('qosClass') + 1]
+container_columns = header_labels[header_labels.index('container_name'):]
+wrap_text_columns = ['description', 'url', 'how_to_install']
+
+class ContainerSummary:
+    # the container_* columns of one row
+    __slots__ = container_columns
+
+    def __init__(self, *values):
+        for label, value in zip(container_columns, values):
+            setattr(self, label, value)
+
+class PodSummary:
+    # the pod columns (None when not applicable) and its containers, built
+    # once per pod so that the raw object can be dropped
+    # expected_pods is the num_of_pods text of the rules, num_of_pods adds
+    # what was observed in the dump (see apply_pod_group())
+    __slots__ = pod_columns + ['containers', 'expected_pods']
+
+    def __init__(self):
+        for label in pod_columns:
+            setattr(self, label, None)
+        self.containers = []
+        self.expected_pods = None
+
+    def row_values(self):
+        # one list per container row in header_labels order, the pod columns
+        # are only set on the first row
+        rows = []
+        blank = [None] * len(pod_columns)
+        for ctr in self.containers or [None]:
+            values = [getattr(self, label) for label in pod_columns] if not rows else list(blank)
+            if ctr:
+                values.extend(getattr(ctr, label) for label in container_columns)
+            else:
+                values.extend([None] * len(container_columns))
+            rows.append(values)
+        return rows
+
+def build_pod_summary(item, pod_name, desc, index):
+    md = item['metadata']
+    spec = item['spec']
+    status = item['status']
+    ns = md['namespace']
+    refs = md.get('ownerReferences')
+    pod = PodSummary()
+
+    logger.debug('* ns:%s, pod_name:%s, phase:%s', ns, md['name'], status['phase'])
+    with stage('description lookup'):
+        pod.ns = ns
+        pod.pod_name = pod_name
+        record = find_desc(desc, ns, pod_name)
+        pod.description = record['desc']
+        pod.url = record['url']
+        pod.custom_resources = record['custom_resources']
+        pod.how_to_install = record['how_to_install']
+
+    if refs:
+        ref = refs[0]
+        if len(refs) > 1:
+            logger.error('!! more than one ownerReferences !!')
+            sys.exit(1)
 
-    for item in alldata['Pod']:
+        with stage('owner lookup'):
+            # 'number of pods' column
+            pod.expected_pods = get_number_of_pods(index, spec.get('nodeSelector', ''), ref['kind'], ref['name'], pod_name, ns)
+            pod.owner_kind = normalize_owner_kind(index, ref['kind'], ref['name'], ns)
+            pod.owner_name = normalize_owner_name(ref['kind'], ref['name'])
+
+    logger.debug('  affinity:%s', spec.get('affinity', ''))
+    pod.affinity = dict2yaml(spec.get('affinity', ''))
+    logger.debug('  dnsPolicy:%s, hostNetwork:%s, hostPID:%s', spec.get('dnsPolicy', ''), spec.get('hostNetwork', ''), spec.get('hostPID', ''))
+    pod.dnsPolicy = spec.get('dnsPolicy', '')
+    pod.enableServiceLinks = str(spec.get('enableServiceLinks', '')).lower()
+    pod.hostNetwork = str(spec.get('hostNetwork', '')).lower()
+    pod.hostPID = str(spec.get('hostPID', '')).lower()
+    # print('  nodeName:{}, role:{}, nodeSelector:{}'.format(spec.get('nodeName', ''), hostname2role(spec.get('nodeName', '')), spec.get('nodeSelector', '')))
+    # pod.nodeName = spec.get('nodeName', '')
+    # pod.role = hostname2role(spec.get('nodeName', ''))
+    pod.nodeSelector = dict2yaml(spec.get('nodeSelector', ''))
+    logger.debug('  preemptionPolicy:%s, priorityClassName:%s', spec.get('preemptionPolicy', ''), spec.get('priorityClassName', ''))
+    pod.preemptionPolicy = spec.get('preemptionPolicy', '')
+    pod.priority = spec.get('priority', '')
+    pod.priorityClassName = spec.get('priorityClassName', '')
+    pod.restartPolicy = spec.get('restartPolicy', '')
+    pod.schedulerName = spec.get('schedulerName', '')
+    pod.serviceAccount = spec.get('serviceAccount', '')
+    pod.serviceAccountName = spec.get('serviceAccountName', '')
+    logger.debug('  pod_securityContext:%s', spec.get('securityContext', ''))
+    pod.pod_securityContext = dict2yaml(spec.get('securityContext', ''))
+    logger.debug('  tolerations:%s', spec.get('tolerations', ''))
+    pod.tolerations = dict2yaml(spec.get('tolerations', ''))
+    pod.terminationGracePeriodSeconds = spec.get('terminationGracePeriodSeconds', '')
+    logger.debug('  qosClass:%s', status.get('qosClass', ''))
+    pod.qosClass = status.get('qosClass', '')
+
+    ctrs = [(ctr, True) for ctr in spec.get('initContainers', list())] + [(ctr, False) for ctr in spec.get('containers', list())]
+    for ctr, is_init_container in ctrs:
+        if not pod.containers:
+            logger.debug('    ctr_name:%s, ctr_resources:%s, ctr_securityContext:%s',
+                ctr.get('name', ''),
+                ctr.get('resources', ''),
+                ctr.get('securityContext', '')
+            )
+        pod.containers.append(make_container_summary(ctr, is_init_container))
+
+    logger.debug('  => DONE. (%s)', md['name'])
+    return pod
+
+def pod_version(item, index):
+    # what a pod's summary depends on besides the descriptions and rules: its
+    # resourceVersion and the replicas of its owner chain
+    md = item['metadata']
+    ns = md['namespace']
+    refs = md.get('ownerReferences') or []
+    owners = []
+    if refs:
+        for kind, name in find_owner_chain(index, refs[0]['kind'], refs[0]['name'], ns):
+            owner = find_resource_json(index, kind, ns, name)
+            owners.append((kind, name, owner['spec'].get('replicas') if owner else None))
+    return (md.get('resourceVersion'), tuple(owners))
+
+def pod_memo_key(cache):
+    # one entry per input (the digests of the dump files, or the kubectl of
+    # the online mode), the descriptions and rules are in the salt
+    return obj_digest(CACHE_VERSION, 'pods', cache['salt'], cache.get('source'))
+
+def load_pod_memo(cache, items, index, memo=None):
+    # seeds memo, {(ns, name): [pod_name, PodSummary or None]} as used by
+    # group_pods(), with the entries of the previous run whose pod and owners
+    # did not change, all read at once; returns the memo and the versions
+    # to store with save_pod_memo(), None when every pod was found unchanged
+    stored = cache_get(cache, pod_memo_key(cache)) or {}
+    if memo is None:
+        memo = {}
+    versions = {}
+    nreused = 0
+    for item in items:
+        md = item['metadata']
+        key = (md['namespace'], md['name'])
+        version = versions[key] = pod_version(item, index)
+        entry = stored.get(key)
+        if key not in memo and entry and version[0] and entry[0] == version:
+            memo[key] = [entry[1], entry[2]]
+            nreused += 1
+    logger.info('** cache: %s of %s pods unchanged', nreused, len(items))
+    if nreused == len(items) == len(stored):
+        versions = None
+    return memo, versions
+
+def save_pod_memo(cache, memo, versions):
+    stored = {key: (versions[key], entry[0], entry[1]) for key, entry in memo.items() if key in versions and entry[0]}
+    cache_put(cache, pod_memo_key(cache), stored)
+
+# binary and decimal suffixes of kubernetes resource quantities
+QUANTITY_SUFFIXES = {
+    'm': 0.001, '': 1, 'k': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3, 'T': 1000 ** 4, 'P': 1000 ** 5, 'E': 1000 ** 6,
+    'Ki': 1024, 'Mi': 1024 ** 2, 'Gi': 1024 ** 3, 'Ti': 1024 ** 4, 'Pi': 1024 ** 5, 'Ei': 1024 ** 6,
+}
+QUANTITY_RE = re.compile(r'([+-]?[0-9.]+(?:[eE][+-]?[0-9]+)?)([a-zA-Z]*)')
+
+def parse_quantity(value):
+    # '100m' -> 0.1, '50Mi' -> 52428800, None when it is not a quantity
+    m = QUANTITY_RE.fullmatch(str(value).strip())
+    if not m or m.group(2) not in QUANTITY_SUFFIXES:
+        return None
+    return float(m.group(1)) * QUANTITY_SUFFIXES[m.group(2)]
+
+def format_quantity(resource, value):
+    if resource == 'cpu':
+        return '{}m'.format(round(value * 1000))
+    for suffix in ('Gi', 'Mi', 'Ki'):
+        unit = QUANTITY_SUFFIXES[suffix]
+        if value >= unit and value % unit == 0:
+            return '{}{}'.format(int(value // unit), suffix)
+    return str(int(value))
+
+def new_pod_group(item):
+    # item is the pod the summary is built from, the rest is observed over
+    # every pod of the group
+    return {'item': item, 'count': 0, 'nodes': set(), 'containers': {}}
+
+def add_to_pod_group(group, item):
+    spec = item['spec']
+    group['count'] += 1
+    if spec.get('nodeName'):
+        group['nodes'].add(spec['nodeName'])
+    for ctr in spec.get('initContainers', []) + spec.get('containers', []):
+        agg = group['containers'].get(ctr.get('name', ''))
+        if agg is None:
+            # images is an ordered set, the image of the first pod first
+            agg = group['containers'][ctr.get('name', '')] = {'images': {}, 'requests': {}}
+        agg['images'][ctr.get('image', '')] = True
+        requests = (ctr.get('resources') or {}).get('requests') or {}
+        for resource in ('cpu', 'memory'):
+            value = parse_quantity(requests[resource]) if resource in requests else None
+            if value is not None:
+                agg['requests'][resource] = agg['requests'].get(resource, 0) + value
+
+def apply_pod_group(pod, group):
+    # fills the observed columns; recomputed on every call, so it is safe on
+    # summaries that come from the cache or the watch memo
+    # ownerless pods (static, guard pods) have no rule text, only what was observed
+    observed = 'observed {} on {} nodes'.format(group['count'], len(group['nodes']))
+    pod.num_of_pods = '{} ({})'.format(pod.expected_pods, observed) if pod.expected_pods else observed
+    for ctr in pod.containers:
+        agg = group['containers'].get(ctr.container_name)
+        if agg is None:
+            continue
+        images = list(agg['images'])
+        if len(images) > MAX_GROUP_IMAGES:
+            images[MAX_GROUP_IMAGES:] = ['(+{} more)'.format(len(images) - MAX_GROUP_IMAGES)]
+        ctr.container_image = '\n'.join(images)
+        ctr.container_requests_total = '\n'.join('{}: {}'.format(resource, format_quantity(resource, agg['requests'][resource]))
+            for resource in ('cpu', 'memory') if resource in agg['requests'])
+
+def owner_chain_top_kind(index, item):
+    # kind of the topmost owner, so that e.g. the pods of CronJob foo and of
+    # Deployment foo are not grouped together; the pod name already stands
+    # for the owner name, which can differ within a group (the ConfigMap
+    # revision of installer pods, the ReplicaSets of a Deployment without it)
+    refs = item['metadata'].get('ownerReferences')
+    if not refs:
+        return ''
+    return find_owner_chain(index, refs[0]['kind'], refs[0]['name'], item['metadata']['namespace'])[-1][0]
+
+def group_pods(items, index, memo=None):
+    # one pass over the pods: each one is normalized and added to the group
+    # of its (ns, normalized name, topmost owner kind), the first pod of a group
+    # is kept for the summary and the others are released after being counted.
+    # memo, {(ns, name): [pod_name, PodSummary or None]}, keeps the results
+    # across calls by the watch subcommand, where it is invalidated by the
+    # events, and across runs with the cache (see load_pod_memo())
+    groups = {}
+    items.reverse()
+    while items:
+        item = items.pop()
         md = item['metadata']
-        spec = item['spec']
-        status = item['status']
-        row = []
 
-        # if status['phase'] != 'R{}'.format(spec.get('affinity', '')))unning':
+        # if status['phase'] != 'Running':
         #     continue
 
-        refs = md.get('ownerReferences')
-        # rename 'pod_name' column
-        # print('[ns:{}, pod_name:{}, phase:{}]'.format(md['namespace'], md['name'], status['phase']))
-        # pod_name = normalize_pod_name(md['name'], refs[0]['kind'] if refs else '', spec['nodeName'])
-        pod_name = normalize_pod_name(item)
-
-        if pod_exists.get((md['namespace'], pod_name)):
-            print('  => SKIP ({})'.format(md['name']))
-            continue
-        pod_exists[(md['namespace'], pod_name)] = True
+        entry = None
+        if memo is not None:
+            entry = memo.get((md['namespace'], md['name']))
+            if entry is None:
+                entry = memo[(md['namespace'], md['name'])] = [None, None]
 
-        print('* ns:{}, pod_name:{}, phase:{}'.format(md['namespace'], md['name'], status['phase']))
-        xls_input_cell_by_key(sheet, current_row, 'ns', md['namespace'])
-        xls_input_cell_by_key(sheet, current_row, 'pod_name', pod_name)
-
-        xls_input_cell_by_key(sheet, current_row, 'description', get_desc_info(desc, md['namespace'], pod_name, 'desc'))
-        set_cell_wrap_text(sheet.cell(row=current_row, column=header2column['description']))
+        # rename 'pod_name' column
+        if entry and entry[0]:
+            pod_name = entry[0]
+        else:
+            with stage('normalize'):
+                pod_name = normalize_pod_name(item)
+            if entry:
+                entry[0] = pod_name
+
+        key = (md['namespace'], pod_name, owner_chain_top_kind(index, item))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = new_pod_group(item)
+            group['entry'] = entry
+        else:
+            logger.debug('  => GROUPED (%s)', md['name'])
+        add_to_pod_group(group, item)
+    return groups
+
+def iter_pod_summaries(json_data, desc, cache=None, memo=None):
+    # yields a PodSummary for every group of pods with the same normalized
+    # name; the raw pods are released as they are consumed
+    items = json_data['Pod']
+    json_data['Pod'] = []
+    index = json_data['index']
+    versions = None
+    if cache:
+        with stage('cache'):
+            memo, versions = load_pod_memo(cache, items, index, memo)
+    with stage('group'):
+        groups = group_pods(items, index, memo)
+    for (ns, pod_name, top_kind), group in groups.items():
+        item = group.pop('item')
+        md = item['metadata']
+        entry = group['entry']
 
-        xls_input_cell_by_key(sheet, current_row, 'url', get_desc_info(desc, md['namespace'], pod_name, 'url'))
-        set_cell_wrap_text(sheet.cell(row=current_row, column=header2column['url']))
-        set_cell_hyperlink(sheet.cell(row=current_row, column=header2column['url']), get_desc_info(desc, md['namespace'], pod_name, 'url'))
+        if entry and entry[1]:
+            logger.debug('  => UNCHANGED (%s)', md['name'])
+            pod = entry[1]
+        else:
+            with stage('build rows'):
+                pod = build_pod_summary(item, pod_name, desc, index)
+        if entry:
+            entry[1] = pod
+        del item
+        apply_pod_group(pod, group)
+        yield pod
+    if versions is not None:
+        with stage('cache'):
+            save_pod_memo(cache, memo, versions)
+
+def iter_records(json_data, desc, cache=None, memo=None):
+    # flat, format independent records: one per container with the pod
+    # columns repeated, every header label present
+    npod_columns = len(pod_columns)
+    for pod in iter_pod_summaries(json_data, desc, cache, memo):
+        rows = pod.row_values()
+        pod_values = rows[0][:npod_columns]
+        for values in rows:
+            values[:npod_columns] = pod_values
+            yield {label: '' if value is None else value for label, value in zip(header_labels, values)}
+
+def write_csv(records, output, labels=header_labels):
+    with open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=labels)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+
+def write_jsonl(records, output, labels=None):
+    with open(output, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str))
+            f.write('\n')
+
+def write_parquet(records, output, batch_size=PARQUET_BATCH_SIZE, labels=header_labels):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        logger.error('* --format parquet needs pyarrow, exit')
+        sys.exit(1)
+
+    # all columns are strings, empty values become nulls
+    schema = pyarrow.schema([(label, pyarrow.string()) for label in labels])
+    writer = pyarrow.parquet.ParquetWriter(output, schema)
+    columns = {label: [] for label in labels}
+    nrows = 0
+    for record in records:
+        for label in labels:
+            value = record[label]
+            columns[label].append(None if value == '' else str(value))
+        nrows += 1
+        if nrows >= batch_size:
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+            columns = {label: [] for label in labels}
+            nrows = 0
+    if nrows:
+        writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+    writer.close()
+
+record_writers = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
+
+# the sqlite sink splits the pod columns into pods, owners and descriptions,
+# every table is keyed by (snapshot_id, ns, pod_name)
+SQLITE_DESCRIPTION_COLUMNS = ['description', 'url', 'custom_resources', 'how_to_install']
+SQLITE_OWNER_COLUMNS = ['owner_kind', 'owner_name', 'num_of_pods']
+SQLITE_POD_COLUMNS = [label for label in pod_columns if label not in SQLITE_DESCRIPTION_COLUMNS + SQLITE_OWNER_COLUMNS]
+SQLITE_CONTAINER_COLUMNS = ['container_name', 'initContainer', 'container_image', 'container_imagePullPolicy', 'container_resources', 'container_requests_total', 'container_securityContext', 'privileged']
+SQLITE_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY, cluster TEXT NOT NULL, created TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS pods (snapshot_id INTEGER NOT NULL REFERENCES snapshots(id), {}, PRIMARY KEY (snapshot_id, ns, pod_name))'.format(', '.join(SQLITE_POD_COLUMNS)),
+    'CREATE TABLE IF NOT EXISTS owners (snapshot_id INTEGER NOT NULL, ns, pod_name, {}, PRIMARY KEY (snapshot_id, ns, pod_name))'.format(', '.join(SQLITE_OWNER_COLUMNS)),
+    'CREATE TABLE IF NOT EXISTS descriptions (snapshot_id INTEGER NOT NULL, ns, pod_name, {}, PRIMARY KEY (snapshot_id, ns, pod_name))'.format(', '.join(SQLITE_DESCRIPTION_COLUMNS)),
+    'CREATE TABLE IF NOT EXISTS containers (snapshot_id INTEGER NOT NULL, ns, pod_name, {}, PRIMARY KEY (snapshot_id, ns, pod_name, container_name))'.format(', '.join(SQLITE_CONTAINER_COLUMNS)),
+    # one row per image variant of a container
+    'CREATE TABLE IF NOT EXISTS images (snapshot_id INTEGER NOT NULL, ns, pod_name, container_name, image)',
+    'CREATE INDEX IF NOT EXISTS snapshots_cluster ON snapshots (cluster, id)',
+    'CREATE INDEX IF NOT EXISTS pods_host_network ON pods (hostNetwork, snapshot_id)',
+    'CREATE INDEX IF NOT EXISTS pods_host_pid ON pods (hostPID, snapshot_id)',
+    'CREATE INDEX IF NOT EXISTS owners_kind ON owners (owner_kind, snapshot_id)',
+    'CREATE INDEX IF NOT EXISTS containers_privileged ON containers (privileged, snapshot_id)',
+    'CREATE INDEX IF NOT EXISTS images_image ON images (image, snapshot_id)',
+]
+PRIVILEGED_RE = re.compile(r'^privileged: true$', re.MULTILINE)
+
+def sqlite_insert(table, columns):
+    return 'INSERT INTO {} (snapshot_id, {}) VALUES (?, {})'.format(table, ', '.join(columns), ', '.join('?' * len(columns)))
+
+def write_sqlite(pods, output, cluster, batch_size=SQLITE_BATCH_SIZE, previous_digest=None):
+    # every call appends one snapshot; the rows are inserted with executemany
+    # in batches, all in one transaction, so a snapshot is complete or absent.
+    # Returns the digest of the rows; when it equals previous_digest the
+    # snapshot is rolled back, so an unchanged summary adds nothing
+    import sqlite3
+    import hashlib
+    conn = sqlite3.connect(output)
+    try:
+        for statement in SQLITE_SCHEMA:
+            conn.execute(statement)
+        statements = {
+            'pods': sqlite_insert('pods', SQLITE_POD_COLUMNS),
+            'owners': sqlite_insert('owners', ['ns', 'pod_name'] + SQLITE_OWNER_COLUMNS),
+            'descriptions': sqlite_insert('descriptions', ['ns', 'pod_name'] + SQLITE_DESCRIPTION_COLUMNS),
+            'containers': sqlite_insert('containers', ['ns', 'pod_name'] + SQLITE_CONTAINER_COLUMNS),
+            'images': sqlite_insert('images', ['ns', 'pod_name', 'container_name', 'image']),
+        }
+        h = hashlib.sha256()
+        with conn:
+            snapshot_id = conn.execute('INSERT INTO snapshots (cluster, created) VALUES (?, ?)', (cluster, time.strftime('%Y-%m-%dT%H:%M:%S%z'))).lastrowid
+            rows = {table: [] for table in statements}
+
+            def add(table, row):
+                # the digest leaves out the snapshot id
+                rows[table].append(row)
+                h.update(repr((table,) + row[1:]).encode())
+
+            nrows = 0
+            npods = 0
+            for pod in pods:
+                key = (snapshot_id, pod.ns, pod.pod_name)
+                add('pods', (snapshot_id,) + tuple(getattr(pod, label) for label in SQLITE_POD_COLUMNS))
+                if pod.owner_kind is not None:
+                    add('owners', key + tuple(getattr(pod, label) for label in SQLITE_OWNER_COLUMNS))
+                add('descriptions', key + tuple(getattr(pod, label) for label in SQLITE_DESCRIPTION_COLUMNS))
+                for ctr in pod.containers:
+                    images = ctr.container_image.split('\n') if ctr.container_image else []
+                    privileged = 1 if PRIVILEGED_RE.search(ctr.container_securityContext or '') else 0
+                    add('containers', key + (ctr.container_name, ctr.initContainer, images[0] if images else '', ctr.container_imagePullPolicy,
+                        ctr.container_resources, ctr.container_requests_total, ctr.container_securityContext, privileged))
+                    for image in images:
+                        add('images', key + (ctr.container_name, image))
+                    nrows += 1 + len(images)
+                nrows += 3
+                npods += 1
+                if nrows >= batch_size:
+                    for table, values in rows.items():
+                        conn.executemany(statements[table], values)
+                        values.clear()
+                    nrows = 0
+            for table, values in rows.items():
+                conn.executemany(statements[table], values)
+            digest = h.hexdigest()
+            if digest == previous_digest:
+                conn.rollback()
+                logger.info('** sqlite: %s pods of %s unchanged since the last snapshot, nothing written to %s', npods, cluster, output)
+                return digest
+        logger.info('** sqlite: snapshot %s of %s with %s pods in %s', snapshot_id, cluster, npods, output)
+        return digest
+    finally:
+        conn.close()
+
+def get_cell_length(value):
+    # longest line of a multi-line value
+    if value is None:
+        return 0
+    return max(len(s) for s in str(value).split('\n'))
+
+def get_column_width(label, max_length):
+    if label == 'description':
+        return 60
+    if label in ('url', 'custom_resources', 'how_to_install', 'affinity'):
+        return 30
+    if label == 'container_image':
+        return (len(label) + 2) * 1.2
+    return (max_length + 2) * 1.2
+
+def add_pod_merges(sheet, merges):
+    # one vertical merge per pod column for every (start_row, end_row); the
+    # MultiCellRange is built at once because merge_cells() checks every new
+    # range against all existing ones
+    import openpyxl
+    ranges = list(sheet.merged_cells.ranges)
+    for start_row, end_row in merges:
+        for col in range(header2column['ns'], header2column['qosClass'] + 1):
+            ranges.append(openpyxl.worksheet.cell_range.CellRange(min_col=col, min_row=start_row, max_col=col, max_row=end_row))
+    sheet.merged_cells = openpyxl.worksheet.cell_range.MultiCellRange(ranges)
+
+def fill_sheet(sheet, pods):
+    import openpyxl
+    current_row = 1
+    fill_header = openpyxl.styles.PatternFill(patternType='solid', fgColor='D9EAD3')
+    # sheet.freeze_panes = 'A2'
+    sheet.freeze_panes = 'C2'
 
-        xls_input_cell_by_key(sheet, current_row, 'custom_resources', build_crd_str(desc, md['namespace'], pod_name))
+    write_row(sheet, header_labels, 1, 1, fill_header)
+    current_row = current_row + 1
 
-        xls_input_cell_by_key(sheet, current_row, 'how_to_install', get_desc_info(desc, md['namespace'], pod_name, 'how_to_install'))
-        set_cell_wrap_text(sheet.cell(row=current_row, column=header2column['how_to_install']))
+    # column widths are tracked while writing, merges are collected per pod
+    # and added at the end in one go
+    max_lengths = {label: get_cell_length(label) for label in header_labels}
+    merges = []
+    with stage('write cells'):
+        for pod in pods:
+            row_pod_container_start = current_row
+            rows = pod.row_values()
+            for values in rows:
+                for key, value in zip(header_labels, values):
+                    if value is None:
+                        continue
+                    xls_input_cell_by_key(sheet, current_row, key, value)
+                    length = get_cell_length(value)
+                    if length > max_lengths[key]:
+                        max_lengths[key] = length
+                if current_row == row_pod_container_start:
+                    for key in wrap_text_columns:
+                        set_cell_wrap_text(sheet.cell(row=current_row, column=header2column[key]))
+                    set_cell_hyperlink(sheet.cell(row=current_row, column=header2column['url']), pod.url)
+                current_row = current_row + 1
+            if len(rows) > 1:
+                merges.append((row_pod_container_start, current_row - 1))
+
+    with stage('column widths'):
+        add_pod_merges(sheet, merges)
+        for label in header_labels:
+            colname = openpyxl.utils.get_column_letter(header2column[label])
+            sheet.column_dimensions[colname].width = get_column_width(label, max_lengths[label])
+
+def write_xlsx(pods, output):
+    import openpyxl
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = 'Pods'
+    fill_sheet(sheet, pods)
+    with stage('save'):
+        book.save(output)
+
+def register_xlsx_styles(book):
+    import openpyxl
+    font = openpyxl.styles.fonts.Font(name='Source Code Pro Medium')
+    styles = {
+        'header': openpyxl.styles.NamedStyle(name='pod_summary_header', font=copy.copy(openpyxl.styles.DEFAULT_FONT), fill=openpyxl.styles.PatternFill(patternType='solid', fgColor='D9EAD3')),
+        'cell': openpyxl.styles.NamedStyle(name='pod_summary_cell', font=font, alignment=openpyxl.styles.Alignment(vertical='center')),
+        'wrap': openpyxl.styles.NamedStyle(name='pod_summary_wrap', font=font, alignment=openpyxl.styles.Alignment(vertical='center', wrap_text=True)),
+    }
+    for style in styles.values():
+        book.add_named_style(style)
+    return styles
+
+def fill_write_only_sheet(sheet, styles, pods):
+    # openpyxl writes the column widths before the first row, so the rows are
+    # spooled to a temporary file while the widths are computed and then
+    # streamed into the write-only sheet
+    import openpyxl
+    import tempfile
+    sheet.freeze_panes = 'C2'
 
-        if refs:
-            ref = refs[0]
-            if len(refs) > 1:
-                print('!! more than one ownerReferences !!')
+    max_lengths = [get_cell_length(label) for label in header_labels]
+    merges = []
+    current_row = 2
+    with tempfile.TemporaryFile() as spool:
+        for pod in pods:
+            rows = pod.row_values()
+            if len(rows) > 1:
+                merges.append((current_row, current_row + len(rows) - 1))
+            for values in rows:
+                for i, value in enumerate(values):
+                    length = get_cell_length(value)
+                    if length > max_lengths[i]:
+                        max_lengths[i] = length
+                pickle.dump(values, spool, pickle.HIGHEST_PROTOCOL)
+                current_row = current_row + 1
+        nrows = current_row - 2
+
+        for i, label in enumerate(header_labels):
+            letter = openpyxl.utils.get_column_letter(i + 1)
+            sheet.column_dimensions[letter].width = get_column_width(label, max_lengths[i])
+
+        header = []
+        for label in header_labels:
+            cell = openpyxl.cell.WriteOnlyCell(sheet, value=label)
+            cell.style = styles['header'].name
+            header.append(cell)
+        sheet.append(header)
+
+        wrap_columns = [header2column[key] - 1 for key in wrap_text_columns]
+        url_column = header2column['url'] - 1
+        spool.seek(0)
+        for _ in range(nrows):
+            values = pickle.load(spool)
+            cells = []
+            for i, value in enumerate(values):
+                if value is None:
+                    cells.append(None)
+                    continue
+                cell = openpyxl.cell.WriteOnlyCell(sheet, value=value)
+                if i == url_column and value != '':
+                    cell.value = url2link_text(value)
+                    cell.hyperlink = value
+                cell.style = styles['wrap'].name if i in wrap_columns else styles['cell'].name
+                cells.append(cell)
+            sheet.append(cells)
+
+    add_pod_merges(sheet, merges)
+
+def write_xlsx_write_only(pods, output):
+    import openpyxl
+    book = openpyxl.Workbook(write_only=True)
+    styles = register_xlsx_styles(book)
+    sheet = book.create_sheet('Pods')
+    with stage('write cells'):
+        fill_write_only_sheet(sheet, styles, pods)
+    with stage('save'):
+        book.save(output)
+
+def sheet_title(name, used):
+    # excel sheet names are at most 31 chars, without []:*?/\
+    title = re.sub(r'[\[\]:*?/\\]', '_', name)[:31] or 'cluster'
+    base = title
+    n = 2
+    while title in used:
+        suffix = '-{}'.format(n)
+        title = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(title)
+    return title
+
+def write_combined_xlsx(clusters, output, write_only):
+    # clusters: iterable of (cluster name, list of PodSummary), one sheet each
+    import openpyxl
+    used = set()
+    if write_only:
+        book = openpyxl.Workbook(write_only=True)
+        styles = register_xlsx_styles(book)
+        for name, pods in clusters:
+            with stage('write cells'):
+                fill_write_only_sheet(book.create_sheet(sheet_title(name, used)), styles, pods)
+    else:
+        book = openpyxl.Workbook()
+        book.remove(book.active)
+        for name, pods in clusters:
+            fill_sheet(book.create_sheet(sheet_title(name, used)), pods)
+    with stage('save'):
+        book.save(output)
+
+def write_output(json_data, desc, fmt, write_only, output, cache=None, memo=None, cluster=''):
+    if fmt == 'sqlite':
+        with stage('write records'):
+            write_sqlite(iter_pod_summaries(json_data, desc, cache, memo), output, cluster)
+    elif fmt != 'xlsx':
+        with stage('write records'):
+            record_writers[fmt](iter_records(json_data, desc, cache, memo), output)
+    elif write_only:
+        write_xlsx_write_only(iter_pod_summaries(json_data, desc, cache, memo), output)
+    else:
+        write_xlsx(iter_pod_summaries(json_data, desc, cache, memo), output)
+    print_dict2yaml_stats()
+
+def find_cluster_dumps(paths):
+    # every file is one cluster, directories are expanded to their dumps
+    dumps = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(('.json', '.yaml', '.yml')):
+                    dumps.append(os.path.join(path, name))
+        else:
+            dumps.append(path)
+    return dumps
+
+def cluster_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def cluster_names(dumps):
+    # one distinct name per dump: the file name, prefixed with its directory
+    # when another dump has the same file name (outputs/<cluster>/all.yaml),
+    # and numbered when that is not enough (a.json next to a.yaml)
+    names = [cluster_name(dump) for dump in dumps]
+    counts = collections.Counter(names)
+    names = [name if counts[name] == 1 else '{}_{}'.format(os.path.basename(os.path.dirname(os.path.abspath(dump))), name)
+        for dump, name in zip(dumps, names)]
+    used = set()
+    unique = []
+    for name in names:
+        base = name
+        n = 2
+        while name in used:
+            name = '{}-{}'.format(base, n)
+            n += 1
+        used.add(name)
+        unique.append(name)
+    return unique
+
+def worker_debug_logs(debug_log, names):
+    # --debug-log of the parent -> one file per cluster, debug.<cluster>.jsonl
+    if not debug_log:
+        return [None] * len(names)
+    base, ext = os.path.splitext(debug_log)
+    return ['{}.{}{}'.format(base, name, ext) for name in names]
+
+def summarize_cluster(dump, description_yaml, rules_yaml, cache=None, log_level='INFO', debug_log=None):
+    # runs in a worker process, returns the PodSummary list of one cluster
+    setup_logging(log_level, debug_log)
+    try:
+        load_rules(rules_yaml)
+        desc = load_desc(description_yaml, cache)
+        json_data = load_offline_data([dump], cache)
+        return list(iter_pod_summaries(json_data, desc, cache))
+    finally:
+        flush_logging()
+
+def summarize_cluster_to_file(dump, cluster, description_yaml, rules_yaml, fmt, write_only, output, cache=None, log_level='INFO', debug_log=None):
+    # runs in a worker process, writes the summary of one cluster
+    setup_logging(log_level, debug_log)
+    try:
+        load_rules(rules_yaml)
+        desc = load_desc(description_yaml, cache)
+        json_data = load_offline_data([dump], cache)
+        write_output(json_data, desc, fmt, write_only, output, cache, cluster=cluster)
+        return output
+    finally:
+        flush_logging()
+
+def open_args_cache(args):
+    if not args.cache_dir:
+        return None
+    return open_cache(args.cache_dir, args.cache_max_mb, obj_digest(file_stamp(args.description_yaml), file_stamp(args.rules_yaml)))
+
+def batch_main(args):
+    import concurrent.futures
+    dumps = find_cluster_dumps(args.dumps)
+    if not dumps:
+        logger.error('* no cluster dumps found in %s, exit', args.dumps)
+        sys.exit(1)
+    names = cluster_names(dumps)
+    debug_logs = worker_debug_logs(args.debug_log, names)
+    logger.info('* summarizing %s clusters with %s workers', len(dumps), args.jobs or os.cpu_count())
+    if args.debug_log:
+        logger.info('* DEBUG records of the workers go to %s', ', '.join(debug_logs))
+    cache = open_args_cache(args)
+    # forked workers must not inherit buffered debug log records
+    flush_logging()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        if args.combined:
+            if args.format != 'xlsx':
+                logger.error('* --combined needs --format xlsx, exit')
                 sys.exit(1)
-
-            # 'number of pods' column
-            xls_input_cell_by_key(sheet, current_row, 'num_of_pods', get_number_of_pods(spec.get('nodeSelector', ''), ref['kind'], ref['name'], pod_name, md['namespace']))
-            # xls_input_cell_by_key(
-            #     sheet,
-            #     current_row,
-            #     'num_of_pods',
-            #     get_number_of_pods(
-            #         spec.get('nodeSelector', ''),
-            #         ref['kind'],
-            #         normalize_owner_name(ref['kind'], ref['name']),
-            #         pod_name, md['namespace']
-            #     )
-            # )
-
-            xls_input_cell_by_key(sheet, current_row, 'owner_kind', normalize_owner_kind(ref['kind'], ref['name'], md['namespace']))
-            xls_input_cell_by_key(sheet, current_row, 'owner_name', normalize_owner_name(ref['kind'], ref['name']))
-
-        print('  affinity:{}'.format(spec.get('affinity', '')))
-        xls_input_cell_by_key(sheet, current_row, 'affinity', dict2yaml(spec.get('affinity', '')))
-        print('  dnsPolicy:{}, hostNetwork:{}, hostPID:{}'.format(spec.get('dnsPolicy', ''), spec.get('hostNetwork', ''), spec.get('hostPID', '')))
-        xls_input_cell_by_key(sheet, current_row, 'dnsPolicy', spec.get('dnsPolicy', ''))
-        xls_input_cell_by_key(sheet, current_row, 'enableServiceLinks', str(spec.get('enableServiceLinks', '')).lower())
-        xls_input_cell_by_key(sheet, current_row, 'hostNetwork', str(spec.get('hostNetwork', '')).lower())
-        xls_input_cell_by_key(sheet, current_row, 'hostPID', str(spec.get('hostPID', '')).lower())
-        # print('  nodeName:{}, role:{}, nodeSelector:{}'.format(spec.get('nodeName', ''), hostname2role(spec.get('nodeName', '')), spec.get('nodeSelector', '')))
-        # xls_input_cell_by_key(sheet, current_row, 'nodeName', spec.get('nodeName', ''))
-        # xls_input_cell_by_key(sheet, current_row, 'role', hostname2role(spec.get('nodeName', '')))
-        xls_input_cell_by_key(sheet, current_row, 'nodeSelector', dict2yaml(spec.get('nodeSelector', '')))
-        print('  preemptionPolicy:{}, priorityClassName:{}'.format(spec.get('preemptionPolicy', ''), spec.get('priorityClassName', '')))
-        xls_input_cell_by_key(sheet, current_row, 'preemptionPolicy', spec.get('preemptionPolicy', ''))
-        xls_input_cell_by_key(sheet, current_row, 'priority', spec.get('priority', ''))
-        xls_input_cell_by_key(sheet, current_row, 'priorityClassName', spec.get('priorityClassName', ''))
-        xls_input_cell_by_key(sheet, current_row, 'restartPolicy', spec.get('restartPolicy', ''))
-        xls_input_cell_by_key(sheet, current_row, 'schedulerName', spec.get('schedulerName', ''))
-        xls_input_cell_by_key(sheet, current_row, 'serviceAccount', spec.get('serviceAccount', ''))
-        xls_input_cell_by_key(sheet, current_row, 'serviceAccountName', spec.get('serviceAccountName', ''))
-        print('  pod_securityContext:{}'.format(spec.get('securityContext', '')))
-        xls_input_cell_by_key(sheet, current_row, 'pod_securityContext', dict2yaml(spec.get('securityContext', '')))
-        print('  tolerations:{}'.format(spec.get('tolerations', '')))
-        xls_input_cell_by_key(sheet, current_row, 'tolerations', dict2yaml(spec.get('tolerations', '')))
-        xls_input_cell_by_key(sheet, current_row, 'terminationGracePeriodSeconds', spec.get('terminationGracePeriodSeconds', ''))
-        print('  qosClass:{}'.format(status.get('qosClass', '')))
-        xls_input_cell_by_key(sheet, current_row, 'qosClass', status.get('qosClass', ''))
-
-        nctrs = 0
-        row_pod_container_start = 0
-        for ctr in spec.get('initContainers', list()):
-            make_container_cells(sheet, current_row, ctr, True)
-            if nctrs == 0:
-                print('    ctr_name:{}, ctr_resources:{}, ctr_securityContext:{}'.format(
-                    ctr.get('name', ''),
-                    ctr.get('resources', ''),
-                    ctr.get('securityContext', '')
-                ))
-                row_pod_container_start = current_row
-            else:
-                for col in range(header2column['ns'], header2column['qosClass'] + 1):
-                    sheet.merge_cells(start_row=row_pod_container_start, end_row=current_row, start_column=col, end_column=col)
-
-            nctrs += 1
-            current_row = current_row + 1
-
-        for ctr in spec.get('containers', list()):
-            make_container_cells(sheet, current_row, ctr, False)
-            if nctrs == 0:
-                print('    ctr_name:{}, ctr_resources:{}, ctr_securityContext:{}'.format(
-                    ctr.get('name', ''),
-                    ctr.get('resources', ''),
-                    ctr.get('securityContext', '')
-                ))
-                row_pod_container_start = current_row
-            else:
-                for col in range(header2column['ns'], header2column['qosClass'] + 1):
-                    sheet.merge_cells(start_row=row_pod_container_start, end_row=current_row, start_column=col, end_column=col)
-
-            nctrs += 1
-            current_row = current_row + 1
-
-        print('  => DONE. ({})'.format(md['name']))
-
-    def get_cell_length(value):
-        # print('*** get_cell_length(): value={}'.format(value))
-        if str(value).find('\n'):
-            sentences = str(value).split('\n')
-            # print('*** sentences={}'.format(sentences))
-            max_length = 0
-            for s in sentences:
-                if len(s) > max_length:
-                    max_length = len(s)
-            return max_length
-        return len(str(value))
-
-    for col in sheet.columns:
-        max_length = 0
-        colname = col[0].column_letter
-        # if col[0].value == 'container_image':
-        #     continue
-
-        for cell in col:
-            length = get_cell_length(cell.value)
-            if length > max_length:
-                   max_length = length
-
-        target_width = 1
-        if col[0].value == 'description':
-            target_width = 60
-        elif col[0].value == 'url':
-            target_width = 30
-        elif col[0].value == 'custom_resources':
-            target_width = 30
-        elif col[0].value == 'how_to_install':
-            target_width = 30
-        elif col[0].value == 'affinity':
-            target_width = 30
-        elif col[0].value == 'container_image':
-            target_width = (len(str(col[0].value)) + 2) * 1.2
+            results = executor.map(summarize_cluster, dumps, [args.description_yaml] * len(dumps), [args.rules_yaml] * len(dumps), [cache] * len(dumps), [args.log_level] * len(dumps), debug_logs)
+            write_combined_xlsx(zip(names, results), args.output, args.write_only)
+            logger.info('* wrote %s', args.output)
+            if cache:
+                cache_evict(cache)
+            return
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        futures = []
+        for dump, name, debug_log in zip(dumps, names, debug_logs):
+            output = os.path.join(args.output_dir, '{}.{}'.format(name, args.format))
+            futures.append(executor.submit(summarize_cluster_to_file, dump, name, args.description_yaml, args.rules_yaml, args.format, args.write_only, output, cache, args.log_level, debug_log))
+        for future in concurrent.futures.as_completed(futures):
+            logger.info('* wrote %s', future.result())
+    if cache:
+        cache_evict(cache)
+
+# fields compared by the diff subcommand, on the pod and on each of its containers
+DIFF_POD_FIELDS = ['tolerations', 'pod_securityContext', 'hostNetwork', 'hostPID']
+DIFF_CONTAINER_FIELDS = ['container_image', 'container_resources', 'container_securityContext']
+diff_labels = ['cluster', 'change', 'ns', 'pod_name', 'container_name', 'field', 'old', 'new']
+
+def field_digest(value):
+    import hashlib
+    return hashlib.sha256(str(value).encode()).digest()
+
+def pod_digests(pod):
+    # (digest of the whole pod, {field: digest}, {container: {field: digest}})
+    import hashlib
+    fields = {label: field_digest(getattr(pod, label)) for label in DIFF_POD_FIELDS}
+    containers = {}
+    for ctr in pod.containers:
+        containers[ctr.container_name] = {label: field_digest(getattr(ctr, label)) for label in DIFF_CONTAINER_FIELDS}
+    h = hashlib.sha256()
+    for label in DIFF_POD_FIELDS:
+        h.update(fields[label])
+    for name in sorted(containers):
+        h.update(name.encode())
+        for label in DIFF_CONTAINER_FIELDS:
+            h.update(containers[name][label])
+    return h.digest(), fields, containers
+
+def index_pods(pods):
+    # {(ns, normalized pod name): (pod, digests)}
+    return {(pod.ns, pod.pod_name): (pod, pod_digests(pod)) for pod in pods}
+
+def diff_record(cluster, change, pod, container_name='', field='', old='', new=''):
+    return {'cluster': cluster, 'change': change, 'ns': pod.ns, 'pod_name': pod.pod_name,
+            'container_name': container_name, 'field': field, 'old': old, 'new': new}
+
+def iter_pod_diff(cluster, old_pods, new_pods):
+    # added, removed and changed pods/containers of new_pods against old_pods,
+    # pods whose whole digest is unchanged are skipped without looking further
+    for key, (new, (new_digest, new_fields, new_containers)) in new_pods.items():
+        if key not in old_pods:
+            yield diff_record(cluster, 'added', new)
+            continue
+        old, (old_digest, old_fields, old_containers) = old_pods[key]
+        if old_digest == new_digest:
+            continue
+        for label in DIFF_POD_FIELDS:
+            if old_fields[label] != new_fields[label]:
+                yield diff_record(cluster, 'changed', new, '', label, getattr(old, label), getattr(new, label))
+        old_ctrs = {ctr.container_name: ctr for ctr in old.containers}
+        for new_ctr in new.containers:
+            name = new_ctr.container_name
+            if name not in old_containers:
+                yield diff_record(cluster, 'added', new, name)
+                continue
+            for label in DIFF_CONTAINER_FIELDS:
+                if old_containers[name][label] != new_containers[name][label]:
+                    yield diff_record(cluster, 'changed', new, name, label, getattr(old_ctrs[name], label), getattr(new_ctr, label))
+        for name in old_containers:
+            if name not in new_containers:
+                yield diff_record(cluster, 'removed', new, name)
+    for key, (old, digests) in old_pods.items():
+        if key not in new_pods:
+            yield diff_record(cluster, 'removed', old)
+
+def write_diff_xlsx(records, output):
+    import openpyxl
+    book = openpyxl.Workbook(write_only=True)
+    styles = register_xlsx_styles(book)
+    sheet = book.create_sheet('Diff')
+    sheet.freeze_panes = 'A2'
+    for i, label in enumerate(diff_labels, 1):
+        max_length = max([get_cell_length(label)] + [get_cell_length(record[label]) for record in records])
+        # old/new can be long multi-line yaml, keep them readable
+        sheet.column_dimensions[openpyxl.utils.get_column_letter(i)].width = (min(max_length, 80) + 2) * 1.2
+    header = []
+    for label in diff_labels:
+        cell = openpyxl.cell.WriteOnlyCell(sheet, value=label)
+        cell.style = styles['header']
+        header.append(cell)
+    sheet.append(header)
+    for record in records:
+        row = []
+        for label in diff_labels:
+            cell = openpyxl.cell.WriteOnlyCell(sheet, value=record[label])
+            cell.style = styles['wrap'] if label in ('old', 'new') else styles['cell']
+            row.append(cell)
+        sheet.append(row)
+    book.save(output)
+
+def diff_main(args):
+    # every dump after the first is compared against the first one
+    import concurrent.futures
+    dumps = find_cluster_dumps(args.dumps)
+    if len(dumps) < 2:
+        logger.error('* diff needs two or more cluster dumps, exit')
+        sys.exit(1)
+    if args.format == 'sqlite':
+        logger.error('* diff writes xlsx, csv, jsonl or parquet, exit')
+        sys.exit(1)
+    names = cluster_names(dumps)
+    debug_logs = worker_debug_logs(args.debug_log, names)
+    if args.debug_log:
+        logger.info('* DEBUG records of the workers go to %s', ', '.join(debug_logs))
+    cache = open_args_cache(args)
+    flush_logging()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        results = executor.map(summarize_cluster, dumps, [args.description_yaml] * len(dumps), [args.rules_yaml] * len(dumps), [cache] * len(dumps), [args.log_level] * len(dumps), debug_logs)
+        with stage('diff'):
+            base = index_pods(next(results))
+            records = []
+            for name, pods in zip(names[1:], results):
+                changes = list(iter_pod_diff(name, base, index_pods(pods)))
+                logger.info('* %s -> %s: %s added, %s removed, %s changed', names[0], name,
+                    sum(1 for r in changes if r['change'] == 'added'),
+                    sum(1 for r in changes if r['change'] == 'removed'),
+                    sum(1 for r in changes if r['change'] == 'changed'))
+                records.extend(changes)
+    with stage('write records'):
+        if args.format == 'xlsx':
+            write_diff_xlsx(records, args.output)
         else:
-            target_width = (max_length + 2) * 1.2
+            record_writers[args.format](records, args.output, labels=diff_labels)
+    logger.info('* wrote %s', args.output)
+    if cache:
+        cache_evict(cache)
+
+def iter_watch_events(f):
+    # `kubectl get --watch -o json --output-watch-events` prints one pretty
+    # printed {"type": ..., "object": ...} after another; an event is decoded
+    # as soon as a line closes a top-level object, so one json event per line
+    # works as well
+    buf = ''
+    for line in f:
+        buf += line
+        if line[:1].isspace() or not line.rstrip().endswith('}'):
+            continue
+        try:
+            event = json.loads(buf)
+        except ValueError:
+            continue
+        buf = ''
+        yield event
+    if buf.strip():
+        logger.warning('** truncated watch event at the end of the stream: %s', buf[:200])
+
+def open_watch_store(json_data):
+    # pods by (ns, name), owners by (kind, ns, name) in the resource index,
+    # and the pods/owners below each owner so that an owner event only
+    # invalidates the summaries of its own pods
+    store = {'index': json_data['index'], 'pods': {}, 'children': collections.defaultdict(set), 'memo': {}}
+    for item in json_data.get('Pod', []):
+        md = item['metadata']
+        store['pods'][(md['namespace'], md['name'])] = item
+    for kind, items in json_data.items():
+        if kind == 'index':
+            continue
+        for item in items:
+            link_owners(store, item)
+    return store
+
+def item_key(item):
+    md = item['metadata']
+    return (item['kind'], md.get('namespace', ''), md['name'])
+
+def link_owners(store, item, unlink=False):
+    kind, ns, name = key = item_key(item)
+    for ref in item['metadata'].get('ownerReferences') or []:
+        children = store['children'][(ref['kind'], ns, ref['name'])]
+        if unlink:
+            children.discard(key)
+        else:
+            children.add(key)
+
+def invalidate(store, key):
+    # drops the summaries of the pod `key` or of every pod below the owner `key`
+    todo = [key]
+    seen = set()
+    while todo:
+        key = todo.pop()
+        if key in seen:
+            continue
+        seen.add(key)
+        kind, ns, name = key
+        if kind == 'Pod':
+            store['memo'].pop((ns, name), None)
+        todo.extend(store['children'].get(key, ()))
+
+def apply_relist(store, kind, items):
+    # replaces the stored objects of `kind` (as in ONLINE_KINDS) with a fresh
+    # list; the objects missing from it were deleted while no watch ran
+    if kind == 'pod':
+        stored = {('Pod',) + key: item for key, item in store['pods'].items()}
+    else:
+        stored = {key: item for key, item in store['index'].items() if key[0].lower() == kind}
+    changed = False
+    for item in items:
+        stored.pop(item_key(item), None)
+        changed = apply_watch_event(store, {'type': 'MODIFIED', 'object': item}) or changed
+    for item in stored.values():
+        changed = apply_watch_event(store, {'type': 'DELETED', 'object': item}) or changed
+    logger.info('** relisted %s %s, %s gone', len(items), kind, len(stored))
+    return changed
+
+def apply_watch_event(store, event):
+    etype = event.get('type')
+    if etype == 'RELIST':
+        return apply_relist(store, event['kind'], event['items'])
+    obj = event.get('object')
+    if etype not in ('ADDED', 'MODIFIED', 'DELETED') or not isinstance(obj, dict) or not obj.get('kind'):
+        # BOOKMARK, or ERROR (e.g. "too old resource version")
+        logger.debug('** ignored watch event %s', etype)
+        return False
+    item = compact_item(obj)
+    kind, ns, name = key = item_key(item)
+    items = store['pods'] if kind == 'Pod' else store['index']
+    ikey = (ns, name) if kind == 'Pod' else key
+    old = items.get(ikey)
+    if old is not None:
+        if etype != 'DELETED' and old['metadata'].get('resourceVersion') and old['metadata'].get('resourceVersion') == item['metadata'].get('resourceVersion'):
+            return False
+        link_owners(store, old, unlink=True)
+    invalidate(store, key)
+    if etype == 'DELETED':
+        items.pop(ikey, None)
+    else:
+        items[ikey] = item
+        link_owners(store, item)
+    logger.debug('** %s %s %s/%s', etype, kind, ns, name)
+    return True
+
+def read_watch_events(f, events):
+    try:
+        for event in iter_watch_events(f):
+            events.put(event)
+    finally:
+        events.put(None)
+
+def watch_kubectl(kubectl, kind, events):
+    # runs until the process exits; a watch that ended (kubectl or the api
+    # server closed it) is started again. A restarted --watch only reports
+    # the objects that exist as ADDED, not the ones deleted meanwhile, so a
+    # plain list replaces the stored objects of the kind first; the objects
+    # the new watch reports unchanged are dropped by their resourceVersion.
+    # A kind the server does not have ends the thread instead
+    import subprocess
+    import tempfile
+    cmd = kubectl.split() + ['get', kind, '-A', '-o', 'json', '--output-watch-events', '--watch']
+    list_cmd = kubectl.split() + ['get', kind, '-A', '-o', 'json']
+    restarted = False
+    try:
+        while True:
+            if restarted:
+                output = subprocess.run(list_cmd, capture_output=True, text=True)
+                if output.returncode != 0:
+                    message = output.stderr.strip()
+                    if "doesn't have a resource type" in message:
+                        logger.warning('** `%s` failed: %s, not watching %s', ' '.join(list_cmd), message, kind)
+                        return
+                    logger.warning('** `%s` failed: %s, retrying in %s sec', ' '.join(list_cmd), message, WATCH_RESTART_DELAY)
+                    time.sleep(WATCH_RESTART_DELAY)
+                    continue
+                events.put({'type': 'RELIST', 'kind': kind, 'items': json.loads(output.stdout).get('items') or []})
+            with tempfile.TemporaryFile() as err:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, text=True)
+                for event in iter_watch_events(proc.stdout):
+                    events.put(event)
+                returncode = proc.wait()
+                err.seek(0)
+                message = err.read().decode(errors='replace').strip()
+            if "doesn't have a resource type" in message:
+                # e.g. deploymentconfig with the DeploymentConfig capability
+                # disabled, a restart would fail the same way forever
+                logger.warning('** `%s` failed: %s, not watching %s', ' '.join(cmd), message, kind)
+                return
+            logger.warning('** `%s` exited with %s%s, restarting in %s sec', ' '.join(cmd), returncode, ': ' + message if message else '', WATCH_RESTART_DELAY)
+            time.sleep(WATCH_RESTART_DELAY)
+            restarted = True
+    finally:
+        events.put(None)
+
+def start_watch_sources(args, events):
+    # returns the number of sources that put a None when they end
+    if args.watch_events:
+        f = sys.stdin if args.watch_events == '-' else open(args.watch_events)
+        threading.Thread(target=read_watch_events, args=(f, events), daemon=True).start()
+        return 1
+    for kind in ONLINE_KINDS:
+        threading.Thread(target=watch_kubectl, args=(args.kubectl, kind, events), daemon=True).start()
+    return len(ONLINE_KINDS)
+
+def write_watch_output(store, desc, args, cache):
+    start = time.perf_counter()
+    pods = sorted(store['pods'].values(), key=lambda x: (x['metadata']['namespace'], x['metadata']['name']))
+    npods = len(pods)
+    nmemo = sum(1 for entry in store['memo'].values() if entry[1])
+    json_data = {'index': store['index'], 'Pod': pods}
+    if args.format == 'sqlite':
+        # a new snapshot in one transaction, only when the summary changed
+        # since the last one of this run, or the database would grow by a
+        # full snapshot every --watch-interval
+        with stage('write records'):
+            store['digest'] = write_sqlite(iter_pod_summaries(json_data, desc, cache, store['memo']), args.output, args.cluster, previous_digest=store.get('digest'))
+        print_dict2yaml_stats()
+    else:
+        # readers of the output never see a partially written file
+        tmp = '{}.{}.tmp'.format(args.output, os.getpid())
+        write_output(json_data, desc, args.format, args.write_only, tmp, cache, store['memo'])
+        os.replace(tmp, args.output)
+    logger.info('* wrote %s (%s pods, %s summaries reused) in %.3f sec', args.output, npods, nmemo, time.perf_counter() - start)
+
+def run_watch(json_data, desc, args, cache):
+    # json_data is the initial list; events are applied as they arrive and
+    # the output is written again at most every --watch-interval seconds
+    store = open_watch_store(json_data)
+    write_watch_output(store, desc, args, cache)
+    # the cached summaries only seed the first output, then the memo of the
+    # store is kept up to date by the events
+    cache = None
+    events = queue.Queue()
+    nsources = start_watch_sources(args, events)
+    logger.info('* watching for changes, writing %s at most every %s sec', args.output, args.watch_interval)
+    first_change = None
+    try:
+        while nsources:
+            timeout = None
+            if first_change is not None:
+                timeout = max(0, first_change + args.watch_interval - time.monotonic())
+            try:
+                event = events.get(timeout=timeout)
+            except queue.Empty:
+                write_watch_output(store, desc, args, cache)
+                first_change = None
+                continue
+            if event is None:
+                nsources -= 1
+            elif apply_watch_event(store, event) and first_change is None:
+                first_change = time.monotonic()
+    except KeyboardInterrupt:
+        logger.info('* interrupted')
+    if first_change is not None:
+        write_watch_output(store, desc, args, cache)
+
+# named questions of the query subcommand, over the latest snapshot of every
+# cluster unless --all-snapshots is given
+QUERIES = {
+    'host-network': ('pods with hostNetwork',
+        "SELECT s.cluster, s.created, p.ns, p.pod_name, p.serviceAccountName FROM pods p JOIN snapshots s ON s.id = p.snapshot_id "
+        "WHERE p.hostNetwork = 'true' AND {snapshots} ORDER BY s.cluster, s.id, p.ns, p.pod_name"),
+    'host-pid': ('pods with hostPID',
+        "SELECT s.cluster, s.created, p.ns, p.pod_name, p.serviceAccountName FROM pods p JOIN snapshots s ON s.id = p.snapshot_id "
+        "WHERE p.hostPID = 'true' AND {snapshots} ORDER BY s.cluster, s.id, p.ns, p.pod_name"),
+    'privileged': ('containers with a privileged securityContext',
+        "SELECT s.cluster, s.created, c.ns, c.pod_name, c.container_name, c.container_image FROM containers c JOIN snapshots s ON s.id = c.snapshot_id "
+        "WHERE c.privileged = 1 AND {snapshots} ORDER BY s.cluster, s.id, c.ns, c.pod_name, c.container_name"),
+    'images': ('images and the namespaces that run them',
+        "SELECT i.image, count(DISTINCT s.cluster || '/' || i.ns) AS namespaces, group_concat(DISTINCT s.cluster || '/' || i.ns) AS where_used "
+        "FROM images i JOIN snapshots s ON s.id = i.snapshot_id WHERE {snapshots} GROUP BY i.image ORDER BY namespaces DESC, i.image"),
+    'owners': ('number of pod groups by owner kind',
+        "SELECT s.cluster, o.owner_kind, count(*) AS pods FROM owners o JOIN snapshots s ON s.id = o.snapshot_id "
+        "WHERE {snapshots} GROUP BY s.cluster, o.owner_kind ORDER BY s.cluster, pods DESC"),
+    'snapshots': ('stored snapshots',
+        "SELECT s.id, s.cluster, s.created, (SELECT count(*) FROM pods p WHERE p.snapshot_id = s.id) AS pods FROM snapshots s "
+        "WHERE {snapshots} ORDER BY s.cluster, s.id"),
+}
+
+def query_main(args):
+    import sqlite3
+    if not os.path.exists(args.db):
+        logger.error('* %s does not exist, exit', args.db)
+        sys.exit(1)
+    params = []
+    if args.all_snapshots:
+        snapshots = '1'
+    else:
+        snapshots = 's.id IN (SELECT max(id) FROM snapshots GROUP BY cluster)'
+    if args.cluster:
+        snapshots += ' AND s.cluster = ?'
+        params.append(args.cluster)
+    if args.sql:
+        sql = args.sql
+        params = []
+    elif args.query:
+        sql = QUERIES[args.query][1].format(snapshots=snapshots)
+    else:
+        for name, (help_text, sql) in QUERIES.items():
+            print('{:<14} {}'.format(name, help_text))
+        return
 
-        sheet.column_dimensions[colname].width = target_width
+    start = time.perf_counter()
+    conn = sqlite3.connect('file:{}?mode=ro'.format(args.db), uri=True)
+    try:
+        cursor = conn.execute(sql, params)
+        writer = csv.writer(sys.stdout, delimiter='\t', lineterminator='\n')
+        writer.writerow([column[0] for column in cursor.description])
+        nrows = 0
+        for row in cursor:
+            writer.writerow(['' if value is None else str(value).replace('\n', '\\n') for value in row])
+            nrows += 1
+    except sqlite3.Error as e:
+        logger.error('* query failed: %s', e)
+        sys.exit(1)
+    except BrokenPipeError:
+        # e.g. piped into head
+        sys.stdout = open(os.devnull, 'w')
+        return
+    finally:
+        conn.close()
+    logger.info('* %s rows in %.3f sec', nrows, time.perf_counter() - start)
+
+def load_cluster(args, cache):
+    with stage('load description'):
+        load_rules(args.rules_yaml)
+        desc = load_desc(args.description_yaml, cache)
+    json_data = load_offline_data(args.offline, cache, kubectl=args.kubectl, jobs=args.kubectl_jobs, chunk_size=args.chunk_size, per_namespace=args.per_namespace)
+    if not args.cluster:
+        args.cluster = cluster_name(args.offline[0]) if args.offline else 'online'
+    # masters, workers = load_nodes(json_data)
+    # print_nodes(masters, workers)
+    return json_data, desc
+
+def summarize_main(args):
+    cache = open_args_cache(args)
+    json_data, desc = load_cluster(args, cache)
+    write_output(json_data, desc, args.format, args.write_only, args.output, cache, cluster=args.cluster)
+    if cache:
+        cache_evict(cache)
+
+def watch_main(args):
+    cache = open_args_cache(args)
+    json_data, desc = load_cluster(args, cache)
+    run_watch(json_data, desc, args, cache)
+    if cache:
+        cache_evict(cache)
 
-    book.save(args.output)
+def main(args):
+    args.func(args)
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({
+            'time': record.created,
+            'level': record.levelname,
+            'process': record.process,
+            'func': record.funcName,
+            'message': record.getMessage(),
+        }, ensure_ascii=False, default=str)
+
+def setup_logging(level='INFO', debug_log=None):
+    # console messages at `level`; with debug_log, every DEBUG record is also
+    # written as a json line through a buffer of DEBUG_LOG_BUFFER records
+    for handler in logger.handlers:
+        # a worker process sets up logging again for every cluster
+        target = getattr(handler, 'target', None)
+        handler.close()
+        if target:
+            target.close()
+    logger.handlers.clear()
+    logger.propagate = False
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    console.setLevel(level)
+    logger.addHandler(console)
+    logger.setLevel(level)
+    if debug_log:
+        from logging.handlers import MemoryHandler
+        target = logging.FileHandler(debug_log, mode='w')
+        target.setFormatter(JsonLinesFormatter())
+        buffered = MemoryHandler(DEBUG_LOG_BUFFER, flushLevel=logging.ERROR, target=target)
+        buffered.setLevel(logging.DEBUG)
+        logger.addHandler(buffered)
+        logger.setLevel(logging.DEBUG)
+
+def flush_logging():
+    for handler in logger.handlers:
+        handler.flush()
 
 def argparse_debug(args):
-    print('* args: {}'.format(args))
-    print('* --online:', args.online)
-    print('* --offline:', args.offline)
-    print('* --description-yaml', args.description_yaml)
-    print('* --output:', args.output)
+    logger.debug('* args: %s', args)
+    for key, value in sorted(vars(args).items()):
+        if key != 'func':
+            logger.debug('* --%s: %s', key.replace('_', '-'), value)
+
+SUBCOMMANDS = ['summarize', 'watch', 'batch', 'diff', 'query']
+
+def build_parser():
+    logs = argparse.ArgumentParser(add_help=False)
+    logs.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='console log level, DEBUG prints every pod (default: INFO, WARNING for query)')
+    logs.add_argument('--quiet', action='store_true', help='only print warnings and errors (same as --log-level WARNING)')
+    logs.add_argument('--debug-log', help='also write DEBUG records to this file as json lines; batch and diff workers write theirs to <name>.<cluster>.<ext> next to it')
+    logs.add_argument('--profile', action='store_true', help='print per-stage timings and peak memory (tracemalloc) at the end')
+    logs.add_argument('--profile-out', help='with --profile, also dump cProfile stats to this file')
+
+    common = argparse.ArgumentParser(add_help=False, parents=[logs])
+    common.add_argument('--description-yaml', default='./description.yaml')
+    common.add_argument('--rules-yaml', default=DEFAULT_RULES_YAML, help='pod/owner name normalization rules')
+    common.add_argument('--cache-dir', help='reuse parsed dumps and pod rows of previous runs from this directory')
+    common.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_MB, help='size limit of --cache-dir, least recently used entries are evicted')
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--format', choices=['xlsx', 'csv', 'jsonl', 'parquet', 'sqlite'], default='xlsx', help='sqlite appends a snapshot to the --output database')
+    output.add_argument('--output', help='default: ./newresult.<format> (./diffresult.<format> for diff)')
+
+    workbook = argparse.ArgumentParser(add_help=False)
+    workbook.add_argument('--write-only', action='store_true', help='stream rows into a write-only workbook (bounded memory)')
+
+    source = argparse.ArgumentParser(add_help=False)
+    source.add_argument('--online', action='store_true', default=True)
+    source.add_argument('--offline', nargs='+', action='extend')
+    source.add_argument('--kubectl', default='kubectl', help='kubectl command used in online mode')
+    source.add_argument('--kubectl-jobs', type=int, default=DEFAULT_KUBECTL_JOBS, help='number of concurrent kubectl in online mode')
+    source.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='kubectl --chunk-size (list pagination) in online mode')
+    source.add_argument('--per-namespace', action='store_true', help='in online mode, run one kubectl per kind and namespace')
+    source.add_argument('--cluster', help='cluster name of --format sqlite snapshots (default: the --offline file name, or online)')
+
+    dumps = argparse.ArgumentParser(add_help=False)
+    dumps.add_argument('dumps', nargs='+', metavar='DUMP', help='cluster dumps, or directories of them')
+    dumps.add_argument('--jobs', type=int, help='number of worker processes (default: number of cpus)')
+
+    parser = argparse.ArgumentParser(description='Summarize OpenShift Pods. Without a subcommand, `summarize` is run.')
+    subparsers = parser.add_subparsers(dest='command', metavar='{}'.format('|'.join(SUBCOMMANDS)))
+    p = subparsers.add_parser('summarize', parents=[source, output, workbook, common], help='summarize one cluster (default)')
+    p.set_defaults(func=summarize_main, output_name='newresult')
+    p = subparsers.add_parser('watch', parents=[source, output, workbook, common], help='after the initial list keep applying `kubectl get --watch` events and rewrite --output')
+    p.add_argument('--watch-interval', type=float, default=DEFAULT_WATCH_INTERVAL, help='seconds between rewrites of --output')
+    p.add_argument('--watch-events', help='read the watch events from this file (- for stdin) instead of kubectl')
+    p.set_defaults(func=watch_main, output_name='newresult')
+    p = subparsers.add_parser('batch', parents=[dumps, output, workbook, common], help='summarize cluster dumps in parallel')
+    p.add_argument('--combined', action='store_true', help='write one workbook with a sheet per cluster to --output')
+    p.add_argument('--output-dir', default='.', help='directory for the per cluster outputs')
+    p.set_defaults(func=batch_main, output_name='newresult', online=False)
+    p = subparsers.add_parser('diff', parents=[dumps, output, common], help='report the pods and containers added, removed or changed in each cluster dump against the first one')
+    p.set_defaults(func=diff_main, output_name='diffresult', online=False)
+    p = subparsers.add_parser('query', parents=[logs], help='answer common questions from --format sqlite snapshots')
+    p.add_argument('db', help='sqlite database written by --format sqlite')
+    p.add_argument('query', nargs='?', choices=list(QUERIES), help='without a query, the queries are listed')
+    p.add_argument('--sql', help='run this SQL instead of a named query')
+    p.add_argument('--cluster', help='only this cluster')
+    p.add_argument('--all-snapshots', action='store_true', help='every snapshot instead of the latest one of each cluster')
+    p.set_defaults(func=query_main, online=False)
+    return parser
+
+def parse_args(argv):
+    # the options of `summarize` are accepted without the subcommand, as
+    # before subcommands existed
+    if not argv or (argv[0] not in SUBCOMMANDS and argv[0] not in ('-h', '--help')):
+        argv = ['summarize'] + argv
+    args = build_parser().parse_args(argv)
+    if 'output' in vars(args) and not args.output:
+        args.output = './{}.{}'.format(args.output_name, args.format)
+    if not args.log_level:
+        # query results go to stdout, keep the progress messages out of them
+        args.log_level = 'WARNING' if args.command == 'query' else 'INFO'
+    if args.quiet:
+        args.log_level = 'WARNING'
+    return args
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--online', action='store_true', default=True)
-    parser.add_argument('--offline', nargs='+', action='extend')
-    parser.add_argument('--description-yaml', default='./description.yaml')
-    parser.add_argument('--output', default='./newresult.xlsx')
-    args = parser.parse_args()
-
-    if args.offline:
-        print('* running in offline mode...')
+    args = parse_args(sys.argv[1:])
+    setup_logging(args.log_level, args.debug_log)
+
+    if not args.online or args.offline:
+        logger.info('* running in offline mode...')
         args.online = False
     else:
-        print('* running in online mode...')
-        output = subprocess.run('oc whoami'.split(), capture_output=True)
-        if output.returncode != 0:
-            print('* oc command failed, exit')
+        logger.info('* running in online mode...')
+        if not kubectl_check(args.kubectl):
+            logger.error('* `%s auth can-i list pods -A` failed (not logged in, or not allowed to list pods), exit', args.kubectl)
             sys.exit(1)
 
     argparse_debug(args)
 
-    main(args)
+    if args.profile or args.profile_out:
+        run_profiled(args)
+    else:
+        main(args)
     sys.exit()